@@ -0,0 +1,75 @@
+"""
+Benchmark parsing clip cards, locator per card vs one html grab + selectolax.
+
+Serves a generated search result page locally, so it runs offline, but needs
+the playwright chromium installed (playwright install chromium).
+Run from the repo root:
+
+    python -m benchmarks.bench_cards --cards 500
+"""
+
+import json
+import tempfile
+from pathlib import Path
+from time import time
+
+import click
+from playwright.sync_api import sync_playwright
+
+from benchmarks.fixtures import clip_cards_html, serve_directory
+from modules.clips import _parse_cards
+
+
+def parse_with_locators(grid) -> list[dict[str, str]]:
+    """The old way, several browser round trips per card."""
+    data = []
+    for card in grid.locator(".mantine-Paper-root").all():
+        youtube_id = (
+            card.locator(".mantine-Image-imageWrapper img")
+            .first.get_attribute("src")
+            .split("/")[-2]
+        )
+        start_time = (
+            card.locator(".mantine-Text-root").all()[1].text_content().split()[0]
+        )
+        data.append({"youtube_id": youtube_id, "start_time": start_time})
+    return data
+
+
+def parse_bulk(grid) -> list[dict[str, str]]:
+    return list(_parse_cards(grid.inner_html()))
+
+
+@click.command()
+@click.option("--cards", type=int, default=300, show_default=True)
+def main(cards: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        (tmp_dir / "search.html").write_text(clip_cards_html(cards), encoding="utf-8")
+
+        results = {"cards": cards}
+        with serve_directory(tmp_dir) as base_url, sync_playwright() as p:
+            browser = p.chromium.launch(headless=True)
+            page = browser.new_page()
+            page.goto(f"{base_url}/search.html")
+            grid = page.locator(".mantine-SimpleGrid-root")
+
+            parsed = {}
+            for name, parse in [
+                ("locators", parse_with_locators),
+                ("bulk", parse_bulk),
+            ]:
+                st = time()
+                parsed[name] = parse(grid)
+                results[f"{name}_seconds"] = round(time() - st, 4)
+            browser.close()
+
+        results["speedup"] = round(
+            results["locators_seconds"] / results["bulk_seconds"], 1
+        )
+        results["equal_output"] = parsed["locators"] == parsed["bulk"]
+        click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark finding the comments of a google docs export, scan per id vs index.
+
+Generates a script export with comments at the bottom, so it runs offline.
+Run from the repo root:
+
+    python -m benchmarks.bench_comments --lines 50000 --comments 3000
+"""
+
+import json
+from time import time
+
+import click
+
+from benchmarks.fixtures import script_export
+from modules.google_docs import ExcelColumnIterator, _find_comments
+
+
+def find_comments_by_scanning(raw_data: list[str], delimiter="#edit "):
+    """The old way, every line is scanned for every id until the first gap."""
+    excel_col_gen = ExcelColumnIterator()
+    matches = []
+    for _ in range(10000):
+        id = f"[{next(excel_col_gen)}]"
+        match = [x.strip() for x in raw_data if id in x]
+        if not match:
+            break
+        if len(match) < 2 or delimiter not in match[1]:
+            continue
+        matches.append((id, *match))
+    return matches
+
+
+@click.command()
+@click.option("--lines", type=int, default=50000, show_default=True)
+@click.option("--comments", type=int, default=3000, show_default=True)
+def main(lines: int, comments: int):
+    raw_data = script_export(lines, comments).splitlines(keepends=True)
+
+    results = {"lines": len(raw_data), "comments": comments}
+    found = {}
+    for name, find in [
+        ("scan", find_comments_by_scanning),
+        ("index", _find_comments),
+    ]:
+        st = time()
+        found[name] = find(raw_data)
+        results[name] = {"seconds": round(time() - st, 3), "found": len(found[name])}
+
+    results["speedup"] = round(
+        results["scan"]["seconds"] / max(results["index"]["seconds"], 1e-3), 1
+    )
+    results["equal"] = found["scan"] == found["index"]
+    click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
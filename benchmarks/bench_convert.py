@@ -0,0 +1,95 @@
+"""
+Benchmark VP9 to h.264 conversion, one ffmpeg process vs segments in parallel.
+
+Generates a VP9 test clip with ffmpeg lavfi, so it runs offline.
+Run from the repo root:
+
+    python -m benchmarks.bench_convert --duration 60 --size 1920x1080
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from time import time
+
+import click
+
+from benchmarks.fixtures import generate_vp9_clip
+from modules import media
+from modules.cache import ProbeCache
+from modules.media import _convert_vp9_to_mp4, _ffprobe
+
+
+def frame_count(file_path: Path) -> int:
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-count_packets",
+        "-show_entries",
+        "stream=nb_read_packets",
+        "-of",
+        "csv=p=0",
+        str(file_path),
+    ]
+    p = subprocess.run(cmd, check=True, capture_output=True, text=True)
+    return int(p.stdout.strip())
+
+
+def duration(file_path: Path) -> float:
+    return float(_ffprobe(file_path)["format"]["duration"])
+
+
+@click.command()
+@click.option("--duration", "clip_duration", type=int, default=30, show_default=True)
+@click.option("--size", type=str, default="1280x720", show_default=True)
+@click.option(
+    "--segments",
+    type=int,
+    default=os.cpu_count() or 4,
+    show_default=True,
+    help="Segments for the parallel mode.",
+)
+def main(clip_duration: int, size: str, segments: int):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        # Probes of the temporary clips stay out of the user's cache
+        media.probe_cache = ProbeCache(tmp_dir / "probe.sqlite3")
+        source = tmp_dir / "source.webm"
+        generate_vp9_clip(source, clip_duration, size)
+
+        results = {}
+        for name, n in [("single", 1), ("segmented", segments)]:
+            output = tmp_dir / f"{name}.mp4"
+            st = time()
+            _convert_vp9_to_mp4(
+                source, output, auto_delete_input_file_after_success=False, segments=n
+            )
+            results[name] = {
+                "segments": n,
+                "seconds": round(time() - st, 3),
+                "duration": duration(output),
+                "frames": frame_count(output),
+            }
+
+        results["source"] = {
+            "duration": duration(source),
+            "frames": frame_count(source),
+        }
+        results["speedup"] = round(
+            results["single"]["seconds"] / results["segmented"]["seconds"], 2
+        )
+        results["equivalent"] = (
+            results["single"]["frames"] == results["segmented"]["frames"]
+            and abs(results["single"]["duration"] - results["segmented"]["duration"])
+            < 0.1
+        )
+        click.echo(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
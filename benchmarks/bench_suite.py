@@ -0,0 +1,241 @@
+"""
+Offline benchmark suite for the media and doc hot paths.
+
+Generates OBS like multi-track recordings, VP9 clips and google docs exports
+locally and times remux, ffprobe, probe, the VP9 conversion and the doc
+commands over increasing input sizes. Results are written as json, pass the
+result of an earlier commit with --compare to see the change per benchmark.
+Run from the repo root:
+
+    python -m benchmarks.bench_suite -o before.json
+    python -m benchmarks.bench_suite -o after.json --compare before.json
+"""
+
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+
+import click
+from click.testing import CliRunner
+
+from benchmarks.fixtures import generate_obs_recording, generate_vp9_clip, script_export
+from modules import google_docs, media
+from modules.cache import ProbeCache
+
+BENCHMARKS = [
+    "remux",
+    "ffprobe",
+    "probe",
+    "convert_vp9",
+    "doc_comments",
+    "doc_length",
+]
+
+
+def _sizes(value: str) -> list[int]:
+    return [int(x) for x in value.split(",") if x]
+
+
+def _time(fn: Callable[[], object], repeat: int, setup: Callable | None = None):
+    """Runs fn repeat times with its output silenced, returns the seconds of every run."""
+    runs = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with redirect_stdout(io.StringIO()):
+            st = perf_counter()
+            fn()
+            runs.append(perf_counter() - st)
+    return runs
+
+
+def _meta() -> dict:
+    def run(cmd: list[str]) -> str:
+        try:
+            p = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        except (OSError, subprocess.CalledProcessError):
+            return ""
+        return p.stdout.splitlines()[0].strip() if p.stdout else ""
+
+    return {
+        "commit": run(["git", "rev-parse", "--short", "HEAD"]),
+        "python": platform.python_version(),
+        "ffmpeg": run(["ffmpeg", "-version"]),
+        "cpus": os.cpu_count(),
+    }
+
+
+def _link(source: Path, target: Path):
+    # Hard links are separate paths for the probe cache without the disk space
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copy(source, target)
+
+
+def bench_media(name: str, durations: list[int], size: str, repeat: int, tmp: Path):
+    results = {}
+    for duration in durations:
+        recording = tmp / f"recording_{duration}s.mkv"
+        if not recording.exists():
+            generate_obs_recording(recording, duration, size=size)
+        clip = tmp / f"clip_{duration}s.webm"
+        if name == "convert_vp9" and not clip.exists():
+            generate_vp9_clip(clip, duration, size)
+
+        if name == "remux":
+            output_dir = tmp / "remux"
+
+            def setup():
+                shutil.rmtree(output_dir, ignore_errors=True)
+                output_dir.mkdir()
+
+            runs = _time(
+                lambda: media._remux_file(
+                    recording, output_dir, media.DiskLimiter(1), quiet=True
+                ),
+                repeat,
+                setup,
+            )
+        elif name == "ffprobe":
+            runs = _time(lambda: media._run_ffprobe(recording), repeat)
+        elif name == "probe":
+            # One recording per second of the size, probed cold as a batch
+            folder = tmp / f"probe_{duration}"
+            folder.mkdir(exist_ok=True)
+            for i in range(duration):
+                if not (folder / f"{i}.mkv").exists():
+                    _link(recording, folder / f"{i}.mkv")
+
+            def setup():
+                media.probe_cache = ProbeCache(tmp / "probe.sqlite3")
+                media.probe_cache.clear()
+
+            runs = _time(
+                lambda: CliRunner().invoke(
+                    media.probe, [str(folder)], catch_exceptions=False
+                ),
+                repeat,
+                setup,
+            )
+        elif name == "convert_vp9":
+            output = tmp / "converted.mp4"
+            runs = _time(
+                lambda: media._convert_vp9_to_mp4(
+                    clip, output, auto_delete_input_file_after_success=False
+                ),
+                repeat,
+                lambda: output.unlink(missing_ok=True),
+            )
+        results[str(duration)] = {"seconds": min(runs), "runs": runs}
+    return results
+
+
+def bench_doc(name: str, lines_sizes: list[int], repeat: int, tmp: Path):
+    results = {}
+    for lines in lines_sizes:
+        doc = tmp / f"script_{lines}.txt"
+        doc.write_text(script_export(lines, comments=lines // 20), encoding="utf-8")
+        if name == "doc_comments":
+            runs = _time(lambda: google_docs.parse_comments(doc), repeat)
+        else:
+            runs = _time(lambda: google_docs.length(doc), repeat)
+        results[str(lines)] = {"seconds": min(runs), "runs": runs}
+    return results
+
+
+def compare(old: dict, new: dict) -> list[str]:
+    """One line per benchmark and size found in both results."""
+    lines = [f"{'benchmark':<14} {'size':>7} {'before':>9} {'after':>9} {'change':>8}"]
+    for name, sizes in new["results"].items():
+        for size, result in sizes.items():
+            before = old["results"].get(name, {}).get(size)
+            if not before:
+                continue
+            ratio = result["seconds"] / before["seconds"]
+            flag = "  slower" if ratio > 1.1 else "  faster" if ratio < 0.9 else ""
+            lines.append(
+                f"{name:<14} {size:>7} {before['seconds']:>8.3f}s "
+                f"{result['seconds']:>8.3f}s {ratio:>7.2f}x{flag}"
+            )
+    return lines
+
+
+@click.command()
+@click.option(
+    "--only",
+    type=click.Choice(BENCHMARKS),
+    multiple=True,
+    help="Run only these benchmarks (Multiple).",
+)
+@click.option(
+    "--durations",
+    default="5,10,20",
+    show_default=True,
+    help="Seconds of generated media, comma separated.",
+)
+@click.option("--size", default="1280x720", show_default=True)
+@click.option(
+    "--lines",
+    "lines_sizes",
+    default="1000,5000,20000",
+    show_default=True,
+    help="Lines of the generated google docs exports, comma separated.",
+)
+@click.option("--repeat", type=int, default=3, show_default=True)
+@click.option(
+    "-o",
+    "--output",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the json here instead of stdout.",
+)
+@click.option(
+    "--compare",
+    "compare_path",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="Earlier result to compare against.",
+)
+def main(
+    only: tuple[str],
+    durations: str,
+    size: str,
+    lines_sizes: str,
+    repeat: int,
+    output: Path | None,
+    compare_path: Path | None,
+):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        # Keep the probes of the generated files out of the user's cache
+        media.probe_cache = ProbeCache(tmp / "probe.sqlite3")
+        for name in only or BENCHMARKS:
+            click.echo(f"Running {name}", err=True)
+            if name.startswith("doc_"):
+                results[name] = bench_doc(name, _sizes(lines_sizes), repeat, tmp)
+            else:
+                results[name] = bench_media(name, _sizes(durations), size, repeat, tmp)
+
+    report = {"meta": _meta(), "results": results}
+    if output:
+        output.write_text(json.dumps(report, indent=2))
+    else:
+        click.echo(json.dumps(report, indent=2))
+
+    if compare_path:
+        old = json.loads(compare_path.read_text())
+        click.echo("\n".join(compare(old, report)), err=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Fixtures generated locally so the benchmarks run offline."""
+
+import functools
+import random
+import subprocess
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(directory: Path):
+    """Serves directory over http on a free local port, yields the base url."""
+    handler = functools.partial(QuietHandler, directory=str(directory))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def clip_cards_html(cards: int) -> str:
+    """Search result page with the same card markup as ytks.app."""
+    items = []
+    for i in range(cards):
+        youtube_id = f"vid{i:08d}"[-11:]
+        minutes, seconds = divmod(i * 7 % 3600, 60)
+        items.append(f"""<div class="mantine-Paper-root">
+  <div class="mantine-Image-root"><div class="mantine-Image-imageWrapper">
+    <img class="mantine-Image-image" src="https://i.ytimg.com/vi/{youtube_id}/mqdefault.jpg">
+  </div></div>
+  <p class="mantine-Text-root">Video title {i}</p>
+  <p class="mantine-Text-root">{minutes:02}:{seconds:02} ...and then the query shows up</p>
+</div>""")
+    return (
+        "<!DOCTYPE html><html><body>"
+        '<div class="mantine-SimpleGrid-root">' + "\n".join(items) + "</div>"
+        "</body></html>"
+    )
+
+
+def generate_vp9_clip(output_file: Path, duration: int, size: str, fps: int = 30):
+    cmd = [
+        "ffmpeg",
+        "-v",
+        "error",
+        "-f",
+        "lavfi",
+        "-i",
+        f"testsrc2=size={size}:rate={fps}:duration={duration}",
+        "-f",
+        "lavfi",
+        "-i",
+        f"sine=frequency=440:duration={duration}",
+        "-c:v",
+        "libvpx-vp9",
+        "-deadline",
+        "realtime",
+        "-cpu-used",
+        "8",
+        "-g",
+        str(fps * 2),
+        "-c:a",
+        "libopus",
+        str(output_file),
+    ]
+    subprocess.run(cmd, check=True)
+
+
+def generate_obs_recording(
+    output_file: Path, duration: int, audio_tracks: int = 4, size: str = "1280x720"
+):
+    """h.264 mkv with several aac tracks, like OBS records desktop, mic etc."""
+    cmd = ["ffmpeg", "-v", "error", "-f", "lavfi", "-i"]
+    cmd.append(f"testsrc2=size={size}:rate=30:duration={duration}")
+    for i in range(audio_tracks):
+        cmd += ["-f", "lavfi", "-i"]
+        cmd.append(f"sine=frequency={220 * (i + 1)}:duration={duration}")
+    for i in range(audio_tracks + 1):
+        cmd += ["-map", str(i)]
+    cmd += ["-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac"]
+    cmd.append(str(output_file))
+    subprocess.run(cmd, check=True)
+
+
+_WORDS = (
+    "the launcher reads every library folder and starts the game in under "
+    "fifty milliseconds so nobody has to wait for updates or ads again"
+).split()
+
+
+def script_export(lines: int, comments: int, delimiter: str = "#edit ") -> str:
+    """Google docs text export of a script with comments at the bottom.
+
+    Every comment id ([a], [b], ... [aa]) is placed on one script line and
+    its note is listed at the end, like google docs exports them.
+    """
+    rng = random.Random(lines * 31 + comments)
+    comment_lines = sorted(rng.sample(range(lines), min(comments, lines)))
+    ids = iter(_comment_ids())
+
+    script = []
+    notes = []
+    next_comment = 0
+    for i in range(lines):
+        words = rng.choices(_WORDS, k=rng.randint(4, 16))
+        if next_comment < len(comment_lines) and comment_lines[next_comment] == i:
+            comment_id = next(ids)
+            words.insert(rng.randint(1, len(words)), f"[{comment_id}]")
+            notes.append(f"[{comment_id}]{delimiter}cut to b-roll {comment_id}")
+            next_comment += 1
+        script.append(" ".join(words))
+    return "\n".join(script + [""] + notes) + "\n"
+
+
+def _comment_ids():
+    """a, b, ... z, aa, ab, ... like google docs numbers comments."""
+    length = 1
+    while True:
+        for n in range(26**length):
+            letters = []
+            for _ in range(length):
+                n, rest = divmod(n, 26)
+                letters.append(chr(ord("a") + rest))
+            yield "".join(reversed(letters))
+        length += 1
@@ -0,0 +1,191 @@
+"""
+Adaptive download concurrency
+
+Downloads hold a slot of an AdaptiveLimiter while they run. Like TCP
+congestion control (AIMD) the number of slots grows by one while the
+throughput keeps rising and is halved when youtube throttles (HTTP 429/403)
+or a download stalls, at most once per round of downloads.
+"""
+
+import asyncio
+import random
+from contextlib import contextmanager
+from threading import Condition
+from time import sleep, time
+from typing import Awaitable, Callable, TypeVar
+
+import click
+
+THROTTLE_STATUS = (403, 429)
+DEFAULT_STALL_SECONDS = 30.0
+
+T = TypeVar("T")
+
+
+def is_throttled(error: BaseException) -> bool:
+    """Whether the error is an HTTP 429 or 403 from yt-dlp or urllib."""
+    status = getattr(error, "status", None) or getattr(error, "code", None)
+    if status in THROTTLE_STATUS:
+        return True
+    text = str(error)
+    return any(f"HTTP Error {x}" in text for x in THROTTLE_STATUS)
+
+
+class AdaptiveLimiter:
+    """Limits how many downloads run at once, shared between threads.
+
+    Without adaptive the limit stays at max_limit, so the fixed and adaptive
+    modes share one code path.
+    """
+
+    def __init__(
+        self,
+        max_limit: int,
+        adaptive: bool = True,
+        min_limit: int = 1,
+        stall_seconds: float = DEFAULT_STALL_SECONDS,
+        clock: Callable[[], float] = time,
+    ):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = min(max(min_limit, 1), self.max_limit)
+        self.adaptive = adaptive
+        self.stall_seconds = stall_seconds
+        self.clock = clock
+        self.limit = self.min_limit if adaptive else self.max_limit
+        self.active = 0
+        self.increases = 0
+        self.decreases = 0
+        self._cond = Condition()
+        # Every change of the limit starts a new round, signals from
+        # downloads started in an earlier round don't change it again
+        self._round = 0
+        self._round_start = clock()
+        self._round_bytes = 0
+        self._round_count = 0
+        self._last_throughput = 0.0
+
+    @contextmanager
+    def slot(self):
+        """Waits for a free slot, yields a yt-dlp progress hook.
+
+        Throttling errors raised inside the block halve the limit, the
+        progress hook does the same for downloads that stall.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.active < self.limit)
+            self.active += 1
+            started_round = self._round
+
+        last_progress = self.clock()
+
+        def progress_hook(status: dict):
+            nonlocal last_progress
+            now = self.clock()
+            if now - last_progress > self.stall_seconds:
+                self.decrease(f"stalled for {now - last_progress:.0f}s", started_round)
+            last_progress = now
+
+        try:
+            yield progress_hook
+        except Exception as e:
+            if is_throttled(e):
+                self.decrease(f"throttled: {e}", started_round)
+            raise
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._cond.notify_all()
+
+    def success(self, nbytes: int):
+        """Records a finished download, grows the limit after a full round."""
+        with self._cond:
+            self._round_bytes += nbytes
+            self._round_count += 1
+            if not self.adaptive or self._round_count < self.limit:
+                return
+
+            elapsed = max(self.clock() - self._round_start, 1e-6)
+            throughput = self._round_bytes / elapsed
+            if throughput >= self._last_throughput and self.limit < self.max_limit:
+                self.limit += 1
+                self.increases += 1
+                click.echo(
+                    f"Throughput {throughput / 1e6:.2f} MB/s, "
+                    f"concurrency {self.limit - 1} -> {self.limit}"
+                )
+                self._cond.notify_all()
+            self._last_throughput = throughput
+            self._new_round()
+
+    def decrease(self, reason: str, started_round: int | None = None):
+        """Halves the limit, once per round."""
+        with self._cond:
+            if not self.adaptive:
+                return
+            if started_round is not None and started_round != self._round:
+                return
+            old = self.limit
+            self.limit = max(self.limit // 2, self.min_limit)
+            self.decreases += 1
+            self._last_throughput = 0.0
+            self._new_round()
+        click.echo(f"Download {reason}, concurrency {old} -> {self.limit}")
+
+    def _new_round(self):
+        self._round += 1
+        self._round_start = self.clock()
+        self._round_bytes = 0
+        self._round_count = 0
+
+    def summary(self) -> str:
+        return (
+            f"Concurrency {self.limit} of {self.max_limit}, "
+            f"{self.increases} increases, {self.decreases} decreases"
+        )
+
+
+def backoff(delay: float, attempt: int) -> float:
+    """Jittered exponential backoff before the next attempt."""
+    return delay * 2**attempt * random.uniform(0.5, 1.5)
+
+
+def retry(
+    fn: Callable[[], T],
+    retries: int,
+    delay: float = 1.0,
+    name: str = "download",
+    on_retry: Callable[[Exception], None] | None = None,
+) -> T:
+    """Calls fn until it succeeds, with jittered exponential backoff."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            seconds = backoff(delay, attempt)
+            click.echo(f"{name} failed: {e!r}, retrying in {seconds:.1f}s")
+            if on_retry:
+                on_retry(e)
+            sleep(seconds)
+
+
+async def retry_async(
+    fn: Callable[[], Awaitable[T]],
+    retries: int,
+    delay: float = 1.0,
+    name: str = "download",
+    on_retry: Callable[[Exception], None] | None = None,
+) -> T:
+    """Like retry, for coroutines."""
+    for attempt in range(retries + 1):
+        try:
+            return await fn()
+        except Exception as e:
+            if attempt == retries:
+                raise
+            seconds = backoff(delay, attempt)
+            click.echo(f"{name} failed: {e!r}, retrying in {seconds:.1f}s")
+            if on_retry:
+                on_retry(e)
+            await asyncio.sleep(seconds)
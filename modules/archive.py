@@ -0,0 +1,90 @@
+"""
+Download archive
+
+Every finished download is recorded by video id, time range and format in a
+SQLite database next to the caches. Later runs skip those downloads before
+any request to youtube. Synced channels also keep a watermark, the newest
+video of the last sync.
+"""
+
+from pathlib import Path
+from time import time
+from typing import Callable
+
+from modules.cache import _SqliteCache, cache_dir
+
+
+def range_key(time_range: tuple[float, float] | None) -> str:
+    """Archive key of a time range in seconds, empty for the whole video."""
+    if time_range is None:
+        return ""
+    start, end = time_range
+    return f"{start:g}-{end:g}"
+
+
+class Archive(_SqliteCache):
+    """Finished downloads and channel sync watermarks.
+
+    A download only counts as finished while its output file still exists,
+    so deleted files are downloaded again.
+    """
+
+    schema = """
+    CREATE TABLE IF NOT EXISTS archive (
+        video_id TEXT NOT NULL,
+        range TEXT NOT NULL,
+        format TEXT NOT NULL,
+        path TEXT NOT NULL,
+        completed_at REAL NOT NULL,
+        PRIMARY KEY (video_id, range, format)
+    );
+    CREATE TABLE IF NOT EXISTS watermark (
+        channel TEXT PRIMARY KEY,
+        video_id TEXT NOT NULL,
+        synced_at REAL NOT NULL
+    );
+    """
+
+    def __init__(self, path: Path | None = None, clock: Callable[[], float] = time):
+        super().__init__(path or cache_dir() / "archive.sqlite3")
+        self.clock = clock
+
+    def get(self, video_id: str, range: str, format: str) -> Path | None:
+        """Returns the output path if the download is finished."""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT path FROM archive WHERE video_id = ? AND range = ? AND format = ?",
+                (video_id, range, format),
+            )
+            .fetchone()
+        )
+        if row is None or not Path(row[0]).exists():
+            return None
+        return Path(row[0])
+
+    def add(self, video_id: str, range: str, format: str, path: Path):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?)",
+                (video_id, range, format, str(Path(path).resolve()), self.clock()),
+            )
+
+    def watermark(self, channel: str) -> str | None:
+        """Id of the newest video of the channel at the last sync."""
+        row = (
+            self._connect()
+            .execute(
+                "SELECT video_id FROM watermark WHERE channel = ?",
+                (channel.rstrip("/"),),
+            )
+            .fetchone()
+        )
+        return row[0] if row else None
+
+    def set_watermark(self, channel: str, video_id: str):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO watermark VALUES (?, ?, ?)",
+                (channel.rstrip("/"), video_id, self.clock()),
+            )
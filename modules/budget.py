@@ -0,0 +1,196 @@
+"""
+Run-wide connection and bandwidth budget
+
+All downloads of a run lease their connections from one budget. When several
+downloads are queued the connections are split between them as concurrent
+fragments. Leases are not rebalanced, so while more downloads can start a
+lease takes at most half of what is free and a later one still gets a share.
+The optional bandwidth ceiling is split the same way.
+"""
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from threading import Condition
+from typing import Callable
+
+DEFAULT_MAX_CONNECTIONS = 16
+
+_UNITS = {"": 1, "K": 1024, "M": 1024**2, "G": 1024**3}
+
+
+def parse_bandwidth(value: str) -> float:
+    """Bytes per second from a value like 500K or 8M."""
+    value = value.strip().upper().removesuffix("/S").removesuffix("B")
+    unit = value[-1] if value and value[-1] in _UNITS else ""
+    number = value[: len(value) - len(unit)]
+    try:
+        return float(number) * _UNITS[unit]
+    except ValueError:
+        raise ValueError(f"Invalid bandwidth {value!r}, expected e.g. 500K or 8M")
+
+
+class ConnectionBudget:
+    """Hands out http connections to downloads, shared between threads.
+
+    Downloads submitted through pool() count as queued until they finish, so
+    a lease knows how many downloads compete for the connections and whether
+    another one can still start. Every download gets at least one connection,
+    leases wait while none is free.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_bandwidth: float | None = None,
+    ):
+        self.max_connections = max_connections
+        self.max_bandwidth = max_bandwidth
+        self.in_use = 0
+        self.bandwidth_in_use = 0.0
+        self.peak = 0
+        self._leases = 0
+        self._workers = 0
+        self._pending = 0
+        self._cond = Condition()
+
+    def configure(self, max_connections: int, max_bandwidth: float | None = None):
+        with self._cond:
+            self.max_connections = max(max_connections, 1)
+            self.max_bandwidth = max_bandwidth
+            self._cond.notify_all()
+
+    def _demand(self) -> int:
+        # Downloads that run at the same time, queued ones beyond the number
+        # of workers have to wait for a worker anyway
+        demand = self._leases + 1
+        if self._workers:
+            demand = max(demand, min(self._pending, self._workers))
+        return demand
+
+    def _share(self, total: float, free: float) -> float:
+        # Only the last worker of the pools can take everything that is free
+        if not self._workers or self._leases + 1 < self._workers:
+            free /= 2
+        return min(total / self._demand(), free)
+
+    @contextmanager
+    def lease(self, connections: int | None = None, downloads: int = 1):
+        """Reserves connections for one download, yields the Lease.
+
+        connections is for downloads with a fixed number of connections, like
+        ffmpeg reading the video and audio stream at once or a plain http
+        download. By default the download gets its share as concurrent
+        fragments. The lease is released when the block is done or when the
+        last of its downloads is reported finished to Lease.progress_hook.
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self.in_use < self.max_connections)
+            free = self.max_connections - self.in_use
+            granted = min(
+                connections or max(int(self._share(self.max_connections, free)), 1),
+                free,
+            )
+            bandwidth = None
+            if self.max_bandwidth:
+                bandwidth = self._share(
+                    self.max_bandwidth, self.max_bandwidth - self.bandwidth_in_use
+                )
+                self.bandwidth_in_use += bandwidth
+            self.in_use += granted
+            self._leases += 1
+            self.peak = max(self.peak, self.in_use)
+
+        lease = Lease(self, granted, bandwidth, downloads)
+        try:
+            yield lease
+        finally:
+            lease.release()
+
+    def _release(self, lease: "Lease"):
+        with self._cond:
+            if lease.released:
+                return
+            lease.released = True
+            self.in_use -= lease.connections
+            self.bandwidth_in_use -= lease.bandwidth or 0.0
+            self._leases -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def pool(self, workers: int):
+        """Thread pool whose submitted downloads count towards the demand."""
+        with self._cond:
+            self._workers += workers
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                yield _BudgetPool(self, executor)
+        finally:
+            with self._cond:
+                self._workers -= workers
+
+    def summary(self) -> str:
+        bandwidth = (
+            f", bandwidth ceiling {self.max_bandwidth / 1024**2:.1f} MiB/s"
+            if self.max_bandwidth
+            else ""
+        )
+        return f"Peak connections {self.peak} of {self.max_connections}{bandwidth}"
+
+
+class Lease:
+    """Connections and bandwidth reserved for one download."""
+
+    def __init__(
+        self,
+        budget: ConnectionBudget,
+        connections: int,
+        bandwidth: float | None,
+        downloads: int,
+    ):
+        self.budget = budget
+        self.connections = connections
+        self.bandwidth = bandwidth
+        self.downloads = downloads
+        self.released = False
+
+    @property
+    def options(self) -> dict:
+        """yt-dlp options that keep the download within the lease."""
+        options = {"concurrent_fragment_downloads": self.connections}
+        if self.bandwidth:
+            options["ratelimit"] = self.bandwidth
+        return options
+
+    def progress_hook(self, status: dict):
+        """Releases the lease before post processing, once all files are in."""
+        if status.get("status") == "finished":
+            self.downloads -= 1
+            if self.downloads <= 0:
+                self.release()
+
+    def release(self):
+        self.budget._release(self)
+
+
+class _BudgetPool:
+    def __init__(self, budget: ConnectionBudget, executor: ThreadPoolExecutor):
+        self.budget = budget
+        self.executor = executor
+
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        budget = self.budget
+        with budget._cond:
+            budget._pending += 1
+
+        def run():
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with budget._cond:
+                    budget._pending -= 1
+                    budget._cond.notify_all()
+
+        return self.executor.submit(run)
+
+
+budget = ConnectionBudget()
@@ -0,0 +1,366 @@
+"""
+Local on-disk caches
+
+Metadata from yt-dlp is cached per video id and ffprobe results per file
+version in SQLite databases under the cache dir, so repeated runs against the
+same videos and files skip the extraction.
+"""
+
+import json
+import os
+import sqlite3
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock, local
+from time import time
+from typing import Callable
+
+import click
+
+DEFAULT_METADATA_TTL = 60 * 60  # stream urls from youtube expire after a few hours
+DEFAULT_METADATA_MAX_BYTES = 256 * 1024 * 1024
+# Probes are a few KB each, enough for archives of a million files
+DEFAULT_PROBE_MAX_ENTRIES = 1_000_000
+# Probes kept in memory during a run, the same file is probed by several steps
+PROBE_MEMORY_ENTRIES = 4096
+
+
+def cache_dir() -> Path:
+    """Folder for all caches, can be overridden with YT_CACHE_DIR."""
+    if os.environ.get("YT_CACHE_DIR"):
+        return Path(os.environ["YT_CACHE_DIR"])
+
+    if os.name == "nt":
+        base = Path(os.environ.get("LOCALAPPDATA", Path.home() / "AppData" / "Local"))
+    else:
+        base = Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+    return base / "yt"
+
+
+def _encode(data: dict) -> bytes:
+    return zlib.compress(json.dumps(data).encode("utf-8"))
+
+
+def _decode(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+class _SqliteCache:
+    """SQLite database with one connection per thread, created on first use."""
+
+    schema = ""
+    # Evicting goes below the limit, so it runs in batches and not per insert
+    evict_to = 0.9
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._local = local()
+        # Running total the limit applies to, read from the database once
+        self._usage: int | None = None
+        self._usage_lock = Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.executescript(self.schema)
+            self._local.conn = conn
+        return conn
+
+    def _add_usage(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        key: str,
+        row_key,
+        amount: int,
+        measure: str,
+    ) -> int:
+        """Adds a row about to be inserted to the running total of measure.
+
+        Has to be called before the insert, a replaced row is subtracted.
+        """
+        if self._usage is None:
+            (self._usage,) = conn.execute(
+                f"SELECT COALESCE(SUM({measure}), 0) FROM {table}"
+            ).fetchone()
+        old = conn.execute(
+            f"SELECT {measure} FROM {table} WHERE {key} = ?", (row_key,)
+        ).fetchone()
+        self._usage += amount - (old[0] if old else 0)
+        return self._usage
+
+    def _evict_oldest(
+        self,
+        conn: sqlite3.Connection,
+        table: str,
+        key: str,
+        order: str,
+        measure: str,
+        limit: int,
+    ):
+        """Deletes the first rows in order until the total is below the limit.
+
+        order has to be indexed, only the evicted rows are read.
+        """
+        target = int(limit * self.evict_to)
+        total = self._usage
+        evict = []
+        cursor = conn.execute(f"SELECT {key}, {measure} FROM {table} ORDER BY {order}")
+        for row_key, amount in cursor:
+            if total <= target:
+                break
+            evict.append((row_key,))
+            total -= amount
+        cursor.close()
+        conn.executemany(f"DELETE FROM {table} WHERE {key} = ?", evict)
+        self._usage = total
+
+
+class MetadataCache(_SqliteCache):
+    """yt-dlp info dicts keyed by video id with TTL and size based eviction.
+
+    Entries are stored as compressed json. When the total size goes above
+    max_bytes the least recently fetched entries are evicted first.
+    """
+
+    schema = """CREATE TABLE IF NOT EXISTS metadata (
+        video_id TEXT PRIMARY KEY,
+        fetched_at REAL NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS metadata_fetched_at ON metadata (fetched_at);"""
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        ttl: float = DEFAULT_METADATA_TTL,
+        max_bytes: int = DEFAULT_METADATA_MAX_BYTES,
+        clock: Callable[[], float] = time,
+    ):
+        super().__init__(path or cache_dir() / "metadata.sqlite3")
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._locks: dict[str, Lock] = {}
+        self._locks_lock = Lock()
+
+    def get(self, video_id: str) -> dict | None:
+        row = (
+            self._connect()
+            .execute(
+                "SELECT fetched_at, data FROM metadata WHERE video_id = ?",
+                (video_id,),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+
+        fetched_at, data = row
+        if self.clock() - fetched_at > self.ttl:
+            self.delete(video_id)
+            return None
+        return _decode(data)
+
+    def put(self, video_id: str, info: dict):
+        data = _encode(info)
+        with self._usage_lock, self._connect() as conn:
+            self._evict_expired(conn)
+            usage = self._add_usage(
+                conn, "metadata", "video_id", video_id, len(data), "size"
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?)",
+                (video_id, self.clock(), len(data), data),
+            )
+            if usage > self.max_bytes:
+                self._evict_oldest(
+                    conn, "metadata", "video_id", "fetched_at", "size", self.max_bytes
+                )
+
+    def delete(self, video_id: str):
+        with self._usage_lock, self._connect() as conn:
+            # Subtracts the size of the deleted row from the running total
+            self._add_usage(conn, "metadata", "video_id", video_id, 0, "size")
+            conn.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+
+    def _evict_expired(self, conn: sqlite3.Connection):
+        deleted = conn.execute(
+            "DELETE FROM metadata WHERE fetched_at < ?", (self.clock() - self.ttl,)
+        ).rowcount
+        if deleted:
+            # Read the total again instead of summing up the deleted rows
+            self._usage = None
+
+    def get_or_extract(self, video_id: str, extract: Callable[[], dict]) -> dict:
+        """Returns the cached info dict or calls extract and caches the result.
+
+        Concurrent calls for the same video id wait for the first extraction
+        instead of extracting it again. Only results for that single video are
+        stored, not playlists or redirects.
+        """
+        with self._locks_lock:
+            lock = self._locks.setdefault(video_id, Lock())
+
+        with lock:
+            info = self.get(video_id)
+            if info is None:
+                info = extract()
+                if info.get("id") == video_id and info.get("_type", "video") == "video":
+                    self.put(video_id, info)
+            return info
+
+    def stats(self) -> dict:
+        conn = self._connect()
+        entries, size, oldest = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), MIN(fetched_at) FROM metadata"
+        ).fetchone()
+        expired = conn.execute(
+            "SELECT COUNT(*) FROM metadata WHERE fetched_at < ?",
+            (self.clock() - self.ttl,),
+        ).fetchone()[0]
+        return {
+            "path": str(self.path),
+            "entries": entries,
+            "expired": expired,
+            "bytes": size,
+            "oldest_age": self.clock() - oldest if oldest is not None else None,
+        }
+
+    def clear(self) -> int:
+        with self._usage_lock, self._connect() as conn:
+            self._usage = None
+            return conn.execute("DELETE FROM metadata").rowcount
+
+
+class ProbeCache(_SqliteCache):
+    """ffprobe results keyed by file path, size and modification time.
+
+    Recent results are kept in memory for the run and all of them in SQLite
+    between runs, so a file is only probed again when it changes. When there
+    are more than max_entries probes the oldest are evicted first.
+    """
+
+    schema = """CREATE TABLE IF NOT EXISTS probe (
+        path TEXT PRIMARY KEY,
+        file_size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        probed_at REAL NOT NULL,
+        size INTEGER NOT NULL,
+        data BLOB NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS probe_probed_at ON probe (probed_at);"""
+
+    def __init__(
+        self,
+        path: Path | None = None,
+        max_entries: int = DEFAULT_PROBE_MAX_ENTRIES,
+        clock: Callable[[], float] = time,
+        memory_entries: int = PROBE_MEMORY_ENTRIES,
+    ):
+        super().__init__(path or cache_dir() / "probe.sqlite3")
+        self.max_entries = max_entries
+        self.clock = clock
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[tuple[str, int, int], dict] = OrderedDict()
+        self._memory_lock = Lock()
+
+    @staticmethod
+    def key(file_path: Path) -> tuple[str, int, int]:
+        stat = file_path.stat()
+        return str(file_path.resolve()), stat.st_size, stat.st_mtime_ns
+
+    def get(self, key: tuple[str, int, int]) -> dict | None:
+        with self._memory_lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        path, file_size, mtime_ns = key
+        row = (
+            self._connect()
+            .execute(
+                "SELECT data FROM probe WHERE path = ? AND file_size = ? AND mtime_ns = ?",
+                (path, file_size, mtime_ns),
+            )
+            .fetchone()
+        )
+        if row is None:
+            return None
+
+        data = _decode(row[0])
+        self._remember(key, data)
+        return data
+
+    def put(self, key: tuple[str, int, int], data: dict):
+        self._remember(key, data)
+
+        encoded = _encode(data)
+        with self._usage_lock, self._connect() as conn:
+            # Entries are counted, one per file
+            usage = self._add_usage(conn, "probe", "path", key[0], 1, "1")
+            conn.execute(
+                "INSERT OR REPLACE INTO probe VALUES (?, ?, ?, ?, ?, ?)",
+                (*key, self.clock(), len(encoded), encoded),
+            )
+            if usage > self.max_entries:
+                self._evict_oldest(
+                    conn, "probe", "path", "probed_at", "1", self.max_entries
+                )
+
+    def _remember(self, key: tuple[str, int, int], data: dict):
+        with self._memory_lock:
+            self._memory[key] = data
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_or_probe(self, file_path: Path, probe: Callable[[Path], dict]) -> dict:
+        """Returns the cached probe of this version of the file or probes it."""
+        key = self.key(file_path)
+        data = self.get(key)
+        if data is None:
+            data = probe(file_path)
+            self.put(key, data)
+        return data
+
+    def stats(self) -> dict:
+        entries, size = (
+            self._connect()
+            .execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM probe")
+            .fetchone()
+        )
+        return {"path": str(self.path), "entries": entries, "bytes": size}
+
+    def clear(self) -> int:
+        with self._memory_lock:
+            self._memory.clear()
+        with self._usage_lock, self._connect() as conn:
+            self._usage = None
+            return conn.execute("DELETE FROM probe").rowcount
+
+
+@click.group()
+def cache():
+    """Inspect or clear the local caches."""
+    pass
+
+
+@cache.command()
+def stats():
+    """Prints stats about the local caches as json"""
+    stats = {"metadata": MetadataCache().stats(), "probe": ProbeCache().stats()}
+    click.echo(json.dumps(stats, indent=2))
+
+
+@cache.command()
+def clear():
+    """Removes all entries from the local caches"""
+    removed = MetadataCache().clear()
+    click.echo(f"Removed {removed} metadata entries")
+    removed = ProbeCache().clear()
+    click.echo(f"Removed {removed} probe entries")
@@ -0,0 +1,517 @@
+from pathlib import Path
+from time import time
+import asyncio
+import urllib.parse
+from contextlib import asynccontextmanager
+from collections import Counter
+from threading import Lock
+from typing import Callable, Iterator
+
+import click
+from playwright.async_api import async_playwright
+from selectolax.lexbor import LexborHTMLParser
+
+from modules.cache import cache_dir
+from modules.adaptive import AdaptiveLimiter
+from modules.archive import range_key
+from modules.dashboard import DONE, RETRYING, SKIPPED, Dashboard
+from modules.download import archive, download_video_ranges
+from modules.formats import format_stats
+from modules.media import _convert_vp9_to_mp4, _needs_h264_conversion
+from modules.pipeline import Pipeline, Stage
+from modules.trace import tracer
+
+
+@click.command()
+@click.argument("query", type=str, required=True)
+@click.argument("urls", type=str, required=True, nargs=-1)
+@click.option("--clip-length", type=int, default=10, help="Clip length in seconds")
+@click.option(
+    "--download-folder",
+    type=click.Path(
+        exists=True,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Number of videos to download at the same time.",
+)
+@click.option(
+    "--adaptive",
+    is_flag=True,
+    default=False,
+    help="Start with one download and grow up to --workers while throughput rises, halve on throttling.",
+)
+@click.option(
+    "--scrape-workers",
+    type=int,
+    default=4,
+    show_default=True,
+    help="Number of search pages to load at the same time.",
+)
+@click.option(
+    "--convert-workers",
+    type=int,
+    default=1,
+    show_default=True,
+    help="Number of VP9 clips to convert to h.264 at the same time.",
+)
+@click.option(
+    "--retries",
+    type=int,
+    default=2,
+    show_default=True,
+    help="How many times to retry a failed search page or download.",
+)
+@click.option(
+    "--stats-json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the stats of every video download and the totals as json.",
+)
+def clips(
+    urls: tuple,
+    query: str,
+    clip_length: int,
+    download_folder: Path,
+    workers: int,
+    adaptive: bool,
+    scrape_workers: int,
+    convert_workers: int,
+    retries: int,
+    stats_json: Path | None,
+):
+    """Finds and downloads clips with the query inside the transcript.
+
+    QUERY What to search youtube for
+    URLS youtube channel/playlist url (Multiple)
+
+    Runs as a pipeline: scrape -> plan -> download -> post-process, so
+    downloads start as soon as the first search page is parsed.
+    """
+    st = time()
+    planner = ClipPlanner(clip_length)
+    limiter = AdaptiveLimiter(workers, adaptive=adaptive)
+    saved_bytes = 0.0
+    lock = Lock()
+    dashboard = Dashboard(f'Clips of "{query}"')
+
+    # Archive keys of the downloaded files, recorded once they are post-processed
+    archive_keys: dict[Path, tuple[str, str]] = {}
+    # Dashboard row of the downloaded files and how many are still post-processed,
+    # a video can have several jobs planned from different search pages
+    owners: dict[Path, str] = {}
+    remaining_files: Counter = Counter()
+
+    def plan(new_clips: list[dict[str, str]]):
+        jobs = planner.plan(new_clips)
+        for job in jobs:
+            dashboard.queued(_job_key(job))
+        return jobs
+
+    def download(job: tuple[str, list[tuple[float, float]], list]) -> list[Path]:
+        nonlocal saved_bytes
+        youtube_id, ranges, clip_ranges = job
+        key = _job_key(job)
+        ranges = [x for x in ranges if not archive.get(youtube_id, range_key(x), "mp4")]
+        if not ranges:
+            dashboard.stage(key, SKIPPED)
+            return []
+
+        video_url = f"https://www.youtube.com/watch?v={youtube_id}"
+        hooks = dashboard.hooks(key)
+        try:
+            with limiter.slot() as progress_hook:
+                dashboard.stage(key, "downloading")
+                file_paths, info_dict = download_video_ranges(
+                    video_url,
+                    ranges,
+                    download_folder=download_folder,
+                    progress_hooks=[progress_hook, *hooks["progress_hooks"]],
+                    postprocessor_hooks=hooks["postprocessor_hooks"],
+                    quiet=True,
+                )
+        except Exception:
+            # Retried by the pipeline, failed is set by on_failure
+            dashboard.stage(key, RETRYING)
+            raise
+        limiter.success(sum(x.stat().st_size for x in file_paths if x.exists()))
+        # yt-dlp downloads the sections in the order of the ranges
+        if len(file_paths) == len(ranges):
+            for file_path, time_range in zip(file_paths, ranges):
+                archive_keys[file_path] = (youtube_id, range_key(time_range))
+        saved = _saved_seconds(clip_ranges, ranges)
+        with lock:
+            saved_bytes += saved * _bytes_per_second(info_dict)
+            for file_path in file_paths:
+                owners[file_path] = key
+            remaining_files[key] += len(file_paths)
+        dashboard.stage(key, "post-process" if file_paths else DONE)
+        return file_paths
+
+    def download_failed(job, error: Exception):
+        planner.forget(job)
+        dashboard.failed(_job_key(job), error)
+
+    def post_process(file_path: Path) -> Path:
+        key = owners[file_path]
+        try:
+            final_path = _convert_if_needed(file_path)
+        except Exception as e:
+            dashboard.failed(key, e)
+            raise
+        if file_path in archive_keys:
+            archive.add(*archive_keys[file_path], "mp4", final_path)
+        with lock:
+            remaining_files[key] -= 1
+            if not remaining_files[key]:
+                dashboard.stage(key, DONE)
+        return final_path
+
+    async def run() -> tuple[Pipeline, list[Path]]:
+        async with BrowserPool(concurrency=scrape_workers) as pool:
+
+            async def scrape(url: str) -> list[dict[str, str]]:
+                key = _page_key(url)
+                data = await _get_clips_async(
+                    pool, url, query, report=lambda x: dashboard.stage(key, x)
+                )
+                dashboard.stage(key, DONE)
+                return data
+
+            pipeline = Pipeline(
+                [
+                    Stage(
+                        "scrape",
+                        scrape,
+                        scrape_workers,
+                        retries=retries,
+                        on_retry=lambda url, e: dashboard.stage(
+                            _page_key(url), RETRYING
+                        ),
+                        on_failure=lambda url, e: dashboard.failed(_page_key(url), e),
+                    ),
+                    Stage("plan", plan, fan_out=True),
+                    Stage(
+                        "download",
+                        download,
+                        workers,
+                        retries=retries,
+                        fan_out=True,
+                        on_failure=download_failed,
+                    ),
+                    Stage("post-process", post_process, convert_workers),
+                ]
+            )
+            return pipeline, await pipeline.run(urls)
+
+    try:
+        with dashboard.live():
+            pipeline, file_paths = asyncio.run(run())
+    finally:
+        if stats_json:
+            dashboard.write_json(stats_json)
+
+    num_clips = planner.num_clips
+    num_ranges = planner.num_ranges
+    num_videos = len(planner.planned)
+    time_elapsed = time() - st
+    print(pipeline.summary())
+    print(f"Num of clips      {num_clips}")
+    if num_clips:
+        print(f"Average time clip {time_elapsed/num_clips:.2f}s")
+    print(f"Total time took   {time_elapsed:.2f}s")
+    print(f"Videos            {num_videos}, {num_ranges} ranges after merging")
+    print(
+        f"Saved requests    {num_clips - num_videos} metadata, "
+        f"{num_clips - num_ranges} downloads"
+    )
+    print(f"Saved bytes       ~{saved_bytes / 1e6:.1f} MB of overlapping clips")
+    print(f"Files             {len(file_paths)}")
+    print(format_stats.summary())
+    if adaptive:
+        print(limiter.summary())
+
+    if pipeline.failed:
+        raise click.ClickException(f"{len(pipeline.failed)} items failed")
+
+
+class ClipPlanner:
+    """Groups clips per video into merged ranges while they are scraped.
+
+    Ranges of a video already planned from an earlier search page are not
+    downloaded again. A new clip overlapping a planned range is downloaded
+    as the whole merged range, so every file is a complete clip.
+    """
+
+    def __init__(self, clip_length: int):
+        self.clip_length = clip_length
+        self.planned: dict[str, list[tuple[float, float]]] = {}
+        self.num_clips = 0
+        self.num_ranges = 0
+
+    def plan(
+        self, clips: list[dict[str, str]]
+    ) -> list[tuple[str, list[tuple[float, float]], list[tuple[float, float]]]]:
+        """Returns (youtube id, ranges, clips inside the ranges) jobs for new ranges."""
+        self.num_clips += len(clips)
+
+        jobs = []
+        for youtube_id, ranges in _plan_downloads(clips, self.clip_length).items():
+            planned = self.planned.get(youtube_id, [])
+            merged = _merge_ranges(planned + ranges)
+            new_ranges = [x for x in merged if x not in planned]
+            self.planned[youtube_id] = merged
+            if new_ranges:
+                self.num_ranges += len(new_ranges)
+                clip_ranges = sorted(
+                    _clip_range(x, self.clip_length)
+                    for x in clips
+                    if x["youtube_id"] == youtube_id
+                )
+                jobs.append(
+                    (youtube_id, new_ranges, _inside_ranges(clip_ranges, new_ranges))
+                )
+        return jobs
+
+    def forget(self, job: tuple[str, list[tuple[float, float]], list]):
+        """Lets later search pages plan the ranges of a failed download again."""
+        youtube_id, ranges, _ = job
+        self.planned[youtube_id] = _subtract_ranges(
+            self.planned.get(youtube_id, []), _merge_ranges(ranges)
+        )
+
+
+def _page_key(url: str) -> str:
+    """Dashboard row of the search page of a video url."""
+    return f"search {url}"
+
+
+def _job_key(job: tuple[str, list[tuple[float, float]], list]) -> str:
+    """Dashboard row of a download job, the video id and its ranges."""
+    youtube_id, ranges, _ = job
+    return f"{youtube_id} {','.join(range_key(x) for x in ranges)}"
+
+
+def _convert_if_needed(file_path: Path) -> Path:
+    """Converts a downloaded clip to h.264 unless it is, returns the final path."""
+    if not _needs_h264_conversion(file_path):
+        return file_path
+
+    output_file_path = file_path.parent / f"{file_path.stem}_converted.mp4"
+    _convert_vp9_to_mp4(file_path, output_file_path, quiet=True)
+    return file_path.with_suffix(output_file_path.suffix)
+
+
+def _seconds(timestamp: str) -> int:
+    """Seconds of a timestamp like 01:23 or 1:02:03."""
+    seconds = 0
+    for part in timestamp.split(":"):
+        seconds = seconds * 60 + int(part)
+    return seconds
+
+
+def _merge_ranges(ranges: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Merges overlapping and adjacent time ranges."""
+    merged: list[tuple[float, float]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _plan_downloads(
+    clips: list[dict[str, str]], clip_length: int
+) -> dict[str, list[tuple[float, float]]]:
+    """Groups clips per youtube id into merged time ranges to download."""
+    ranges: dict[str, list[tuple[float, float]]] = {}
+    for clip in clips:
+        ranges.setdefault(clip["youtube_id"], []).append(_clip_range(clip, clip_length))
+    return {youtube_id: _merge_ranges(x) for youtube_id, x in ranges.items()}
+
+
+def _clip_range(clip: dict[str, str], clip_length: int) -> tuple[float, float]:
+    start = _seconds(clip["start_time"])
+    return start, start + clip_length
+
+
+def _saved_seconds(
+    clip_ranges: list[tuple[float, float]], ranges: list[tuple[float, float]]
+) -> float:
+    """Seconds the merged ranges save against downloading the clips one by one.
+
+    Negative when a clip extended a range that was downloaded before, so the
+    planned part is downloaded again.
+    """
+    clip_seconds = sum(
+        end - start for start, end in _inside_ranges(clip_ranges, ranges)
+    )
+    return clip_seconds - sum(end - start for start, end in ranges)
+
+
+def _inside_ranges(
+    clip_ranges: list[tuple[float, float]], ranges: list[tuple[float, float]]
+) -> list[tuple[float, float]]:
+    """The clip ranges that lie within one of ranges."""
+    return [
+        (start, end)
+        for start, end in clip_ranges
+        if any(x <= start and end <= y for x, y in ranges)
+    ]
+
+
+def _subtract_ranges(
+    ranges: list[tuple[float, float]], covered: list[tuple[float, float]]
+) -> list[tuple[float, float]]:
+    """Parts of ranges not in covered, covered has to be sorted and merged."""
+    result = []
+    for start, end in ranges:
+        for covered_start, covered_end in covered:
+            if covered_end <= start or covered_start >= end:
+                continue
+            if covered_start > start:
+                result.append((start, covered_start))
+            start = max(start, covered_end)
+            if start >= end:
+                break
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def _bytes_per_second(info_dict: dict) -> float:
+    """Estimated download size per second of video from the format bitrates."""
+    formats = info_dict.get("requested_formats") or [info_dict]
+    return sum(x.get("tbr") or 0 for x in formats) * 1000 / 8
+
+
+class BrowserPool:
+    """One headless chromium for the whole run, serving pages to many urls.
+
+    Every page gets its own lightweight browser context. The consent given
+    on the site is stored in a storage state file and loaded into new
+    contexts, so the dialog is only clicked once, also between runs.
+    """
+
+    def __init__(
+        self,
+        headless=True,
+        concurrency=4,
+        storage_state: Path | None = None,
+    ):
+        self.headless = headless
+        self.concurrency = concurrency
+        self.storage_state = storage_state or cache_dir() / "ytks_storage_state.json"
+
+    async def __aenter__(self):
+        self._playwright = await async_playwright().start()
+        self.browser = await self._playwright.chromium.launch(headless=self.headless)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.browser.close()
+        await self._playwright.stop()
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            storage_state = self.storage_state if self.storage_state.exists() else None
+            context = await self.browser.new_context(storage_state=storage_state)
+            try:
+                page = await context.new_page()
+                page.set_default_timeout(5000)
+                yield page
+            finally:
+                await context.close()
+
+    async def save_storage_state(self, page):
+        self.storage_state.parent.mkdir(parents=True, exist_ok=True)
+        await page.context.storage_state(path=self.storage_state)
+
+
+def _scrape_clips(urls, query, on_clips, headless=True, concurrency=4):
+    """Finds clips for all urls, loading several search pages at once.
+
+    on_clips is called with the clips of each url as soon as it's done.
+    """
+
+    async def scrape():
+        async with BrowserPool(headless=headless, concurrency=concurrency) as pool:
+
+            async def scrape_url(url):
+                on_clips(await _get_clips_async(pool, url, query))
+
+            await asyncio.gather(*[scrape_url(url) for url in urls])
+
+    asyncio.run(scrape())
+
+
+def _get_clips(url, query, headless=True) -> list[dict[str, str]]:
+    """Finds clips with the query inside the transcript.
+
+    Returns starttime and youtubeid
+
+
+    """
+    data: list[dict[str, str]] = []
+    _scrape_clips([url], query, data.extend, headless=headless)
+    return data
+
+
+@tracer.traced("get_clips", "clips")
+async def _get_clips_async(
+    pool: BrowserPool, url, query, report: Callable[[str], None] = print
+) -> list[dict[str, str]]:
+    """Clips of one search page, report is called with every step."""
+    url = urllib.parse.quote(url, safe="")
+    query = urllib.parse.quote(query, safe="")
+    url = f"https://ytks.app/search?url={url}&query={query}"
+
+    async with pool.page() as page:
+        report("loading search page")
+        await page.goto(url)
+
+        grid = page.locator(".mantine-SimpleGrid-root")
+        consent = page.get_by_role("button", name="Consent")
+        await grid.or_(consent).first.wait_for(timeout=60000)
+        if await consent.is_visible():
+            report("clicking consent")
+            await consent.click()
+            await pool.save_storage_state(page)
+        await grid.wait_for(timeout=60000)
+
+        report("parsing cards")
+        # One round trip for the whole grid instead of several per card
+        html = await grid.inner_html()
+
+    data = list(_parse_cards(html))
+    report(f"found {len(data)} clips")
+    return data
+
+
+def _parse_cards(html: str) -> Iterator[dict[str, str]]:
+    """Yields youtube id and start time of every clip card in the grid html."""
+    for card in LexborHTMLParser(html).css(".mantine-Paper-root"):
+        # image link
+        image = card.css_first(".mantine-Image-imageWrapper img")
+        if image is None or not image.attributes.get("src"):
+            raise ValueError("Card has no image link")
+        youtube_id = image.attributes["src"].split("/")[-2]
+
+        # start time
+        texts = card.css(".mantine-Text-root")
+        if len(texts) < 2 or not texts[1].text().split():
+            raise ValueError("Card has no start time")
+        start_time = texts[1].text().split()[0]
+
+        yield {"youtube_id": youtube_id, "start_time": start_time}
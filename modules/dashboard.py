@@ -0,0 +1,277 @@
+"""
+Live download dashboard
+
+Concurrent downloads report to one Dashboard through the progress and
+postprocessor hooks of their YoutubeDL instead of printing to the console.
+It renders as a rich Live table with the stage, bytes/s and ETA of every
+running item plus the totals and queue depth of the run, and the collected
+stats can be written as json for later analysis.
+"""
+
+import json
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from time import time
+from typing import Callable
+
+from rich.console import Console, Group
+from rich.filesize import decimal
+from rich.live import Live
+from rich.table import Table
+
+QUEUED = "queued"
+DONE = "done"
+SKIPPED = "skipped"
+FAILED = "failed"
+# Failed, but tried again, counts as active
+RETRYING = "retrying"
+FINISHED = (DONE, SKIPPED, FAILED)
+
+
+class ItemStats:
+    """Progress of one url or video, summed over all files it downloads."""
+
+    def __init__(self, key: str, queued_at: float):
+        self.key = key
+        self.title: str | None = None
+        self.stage = QUEUED
+        self.queued_at = queued_at
+        self.started_at: float | None = None
+        self.finished_at: float | None = None
+        self.error: str | None = None
+        # Filename -> [downloaded bytes, total bytes, bytes/s]
+        self.files: dict[str, list] = {}
+        # Postprocessor -> seconds
+        self.postprocessors: dict[str, float] = {}
+        self._postprocessor_started: dict[str, float] = {}
+
+    @property
+    def downloaded(self) -> int:
+        return sum(x[0] for x in self.files.values())
+
+    @property
+    def total(self) -> int:
+        return sum(x[1] or x[0] for x in self.files.values())
+
+    @property
+    def speed(self) -> float:
+        return sum(x[2] for x in self.files.values())
+
+    @property
+    def eta(self) -> float | None:
+        if not self.speed:
+            return None
+        return max(self.total - self.downloaded, 0) / self.speed
+
+    def to_dict(self) -> dict:
+        elapsed = None
+        if self.started_at is not None and self.finished_at is not None:
+            elapsed = round(self.finished_at - self.started_at, 3)
+        return {
+            "key": self.key,
+            "title": self.title,
+            "stage": self.stage,
+            "error": self.error,
+            "bytes": self.downloaded,
+            "files": len(self.files),
+            "wait_seconds": (
+                round(self.started_at - self.queued_at, 3)
+                if self.started_at is not None
+                else None
+            ),
+            "seconds": elapsed,
+            "bytes_per_second": (
+                round(self.downloaded / elapsed, 1) if elapsed else None
+            ),
+            "postprocessors": {k: round(v, 3) for k, v in self.postprocessors.items()},
+        }
+
+
+class Dashboard:
+    """Collects the progress of all items of a run, shared between threads."""
+
+    def __init__(
+        self, title: str, max_rows: int = 12, clock: Callable[[], float] = time
+    ):
+        self.title = title
+        self.max_rows = max_rows
+        self.clock = clock
+        self.items: dict[str, ItemStats] = {}
+        self.started_at = clock()
+        self._lock = Lock()
+
+    def queued(self, key: str, title: str | None = None):
+        with self._lock:
+            item = self.items.setdefault(key, ItemStats(key, self.clock()))
+            item.title = title or item.title
+
+    def stage(self, key: str, stage: str):
+        with self._lock:
+            item = self.items.setdefault(key, ItemStats(key, self.clock()))
+            if item.started_at is None and stage != QUEUED:
+                item.started_at = self.clock()
+            item.stage = stage
+            # A failed item can be retried
+            item.finished_at = self.clock() if stage in FINISHED else None
+            if stage in FINISHED:
+                for x in item.files.values():
+                    x[2] = 0.0
+
+    def failed(self, key: str, error: BaseException):
+        self.stage(key, FAILED)
+        with self._lock:
+            self.items[key].error = repr(error)
+
+    def hooks(self, key: str) -> dict:
+        """yt-dlp options that report the progress of the item here."""
+
+        def progress_hook(status: dict):
+            info = status.get("info_dict") or {}
+            filename = status.get("filename") or info.get("_filename") or ""
+            downloaded = status.get("downloaded_bytes") or 0
+            total = status.get("total_bytes") or status.get("total_bytes_estimate")
+            speed = status.get("speed") or 0.0
+            if status.get("status") != "downloading":
+                speed = 0.0
+            with self._lock:
+                item = self.items[key]
+                item.title = item.title or info.get("title")
+                if item.started_at is None:
+                    item.started_at = self.clock()
+                if item.stage == QUEUED:
+                    item.stage = "downloading"
+                item.files[filename] = [downloaded, int(total or 0), speed]
+
+        def postprocessor_hook(status: dict):
+            name = status.get("postprocessor") or "postprocess"
+            with self._lock:
+                item = self.items[key]
+                if status.get("status") == "started":
+                    item.stage = name
+                    item._postprocessor_started[name] = self.clock()
+                elif status.get("status") == "finished":
+                    st = item._postprocessor_started.pop(name, None)
+                    if st is not None:
+                        item.postprocessors[name] = (
+                            item.postprocessors.get(name, 0.0) + self.clock() - st
+                        )
+
+        return {
+            "progress_hooks": [progress_hook],
+            "postprocessor_hooks": [postprocessor_hook],
+        }
+
+    def totals(self) -> dict:
+        with self._lock:
+            return self._totals()
+
+    def _totals(self) -> dict:
+        items = list(self.items.values())
+        stages = [x.stage for x in items]
+        finished = sum(map(stages.count, FINISHED))
+        elapsed = max(self.clock() - self.started_at, 1e-6)
+        downloaded = sum(x.downloaded for x in items)
+        speed = sum(x.speed for x in items)
+        running = [x for x in items if x.stage not in FINISHED and x.speed]
+        remaining = sum(max(x.total - x.downloaded, 0) for x in running)
+        return {
+            "items": len(items),
+            "queued": stages.count(QUEUED),
+            "active": len(items) - stages.count(QUEUED) - finished,
+            "done": stages.count(DONE),
+            "skipped": stages.count(SKIPPED),
+            "retrying": stages.count(RETRYING),
+            "failed": stages.count(FAILED),
+            "bytes": downloaded,
+            "seconds": round(elapsed, 3),
+            "bytes_per_second": round(speed, 1),
+            "average_bytes_per_second": round(downloaded / elapsed, 1),
+            "eta": round(remaining / speed, 1) if speed else None,
+        }
+
+    def render(self) -> Group:
+        table = Table(title=self.title, expand=False)
+        table.add_column("Item", overflow="ellipsis", no_wrap=True, max_width=50)
+        table.add_column("Stage")
+        table.add_column("Size", justify="right")
+        table.add_column("Speed", justify="right")
+        table.add_column("ETA", justify="right")
+
+        with self._lock:
+            totals = self._totals()
+            items = list(self.items.values())
+            # Running items first, then the latest finished ones
+            running = [x for x in items if x.stage not in (QUEUED, *FINISHED)]
+            finished = sorted(
+                (x for x in items if x.stage in FINISHED),
+                key=lambda x: x.finished_at,
+                reverse=True,
+            )
+            rows = (running + finished)[: self.max_rows]
+            for item in rows:
+                table.add_row(
+                    item.title or item.key,
+                    item.stage,
+                    _size(item.downloaded, item.total),
+                    f"{decimal(int(item.speed))}/s" if item.speed else "",
+                    _duration(item.eta),
+                    style=(
+                        "red"
+                        if item.stage == FAILED
+                        else "yellow" if item.stage == RETRYING else None
+                    ),
+                )
+
+        hidden = len(items) - totals["queued"] - len(rows)
+        if hidden > 0:
+            table.add_row(f"... {hidden} more", "", "", "", "")
+
+        line = (
+            f"{totals['done']}/{totals['items']} done, {totals['active']} active, "
+            f"{totals['queued']} queued, {totals['skipped']} skipped, "
+            f"{totals['retrying']} retrying, {totals['failed']} failed | "
+            f"{decimal(totals['bytes'])} "
+            f"at {decimal(int(totals['bytes_per_second']))}/s "
+            f"(avg {decimal(int(totals['average_bytes_per_second']))}/s)"
+        )
+        if totals["eta"] is not None:
+            line += f" | ETA {_duration(totals['eta'])}"
+        return Group(table, line)
+
+    @contextmanager
+    def live(self, console: Console | None = None):
+        """Renders the dashboard until the block is done.
+
+        Output printed in the meantime shows up above the dashboard.
+        """
+        live = Live(console=console, get_renderable=self.render, refresh_per_second=4)
+        with live:
+            yield self
+        if not live.console.is_terminal:
+            # Only the final state is printed, without a line break
+            live.console.line()
+
+    def to_dict(self) -> dict:
+        totals = self.totals()
+        with self._lock:
+            items = [x.to_dict() for x in self.items.values()]
+        return {"title": self.title, "totals": totals, "items": items}
+
+    def write_json(self, path: Path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+
+def _size(downloaded: int, total: int) -> str:
+    if not total:
+        return ""
+    if downloaded >= total:
+        return decimal(total)
+    return f"{decimal(downloaded)}/{decimal(total)}"
+
+
+def _duration(seconds: float | None) -> str:
+    if seconds is None:
+        return ""
+    minutes, seconds = divmod(int(seconds), 60)
+    return f"{minutes}:{seconds:02d}"
@@ -0,0 +1,214 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+
+import click
+from rich.console import Console
+from rich.table import Table
+
+from modules import google_docs
+from modules.files import iter_files
+
+
+@click.group(invoke_without_command=True)
+@click.pass_context
+def doc(ctx):
+    if ctx.invoked_subcommand is None:
+        # click.echo('I was invoked without subcommand')
+        pass
+    else:
+        # click.echo(f"I am about to invoke {ctx.invoked_subcommand}")
+        pass
+
+
+def _batch_options(fn):
+    fn = click.option(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        show_default=True,
+        help="Number of scripts to process at the same time.",
+    )(fn)
+    fn = click.option(
+        "--format",
+        "output_format",
+        type=click.Choice(["table", "json", "ndjson"]),
+        default="table",
+        show_default=True,
+        help="table prints rich tables, json one document, ndjson one line per script.",
+    )(fn)
+    fn = click.argument(
+        "paths",
+        nargs=-1,
+        required=True,
+        type=click.Path(
+            exists=True,
+            file_okay=True,
+            readable=True,
+            path_type=Path,
+        ),
+    )(fn)
+    return fn
+
+
+@doc.command(name="default")
+@_batch_options
+def doc_default(paths: tuple[Path], output_format: str, workers: int):
+    """Comments and length of scripts, directories are searched for .txt exports"""
+    _run_batch(paths, output_format, workers, comments=True, length=True)
+
+
+@doc.command(name="comments")
+@_batch_options
+@click.option(
+    "-d", "--delimiter", type=str, default="#edit ", help="What to split comments with"
+)
+def doc_comments(paths: tuple[Path], output_format: str, workers: int, delimiter):
+    _run_batch(paths, output_format, workers, comments=True, delimiter=delimiter)
+
+
+@doc.command(name="length")
+@_batch_options
+@click.option(
+    "-w",
+    "--words-per-minute",
+    "wpm",
+    type=int,
+    default=160,
+    help="How many words per minute to calculate length of script.",
+)
+@click.option(
+    "-d",
+    "--delimiter",
+    type=str,
+    default="#edit ",
+    help="What to remove comments with, to exclude them from the calculation",
+)
+def doc_length(paths: tuple[Path], output_format: str, workers: int, wpm, delimiter):
+    _run_batch(
+        paths,
+        output_format,
+        workers,
+        length=True,
+        words_per_minute=wpm,
+        delimiter=delimiter,
+    )
+
+
+def _process_script(
+    path: Path,
+    comments: bool,
+    length: bool,
+    words_per_minute: int,
+    delimiter: str,
+) -> dict:
+    """Result of one script as a json friendly dict, runs in a worker process."""
+    result = {"path": str(path)}
+    try:
+        if length:
+            result["length"] = google_docs.script_length(
+                path, words_per_minute=words_per_minute, delimiter=delimiter
+            ).to_dict()
+        if comments:
+            result["comments"] = google_docs.script_comments(path, delimiter=delimiter)
+    except (OSError, UnicodeDecodeError) as e:
+        return {"path": str(path), "error": str(e)}
+    return result
+
+
+def _summary(results: list[dict]) -> dict:
+    ok = [x for x in results if "error" not in x]
+    summary = {"scripts": len(ok), "errors": len(results) - len(ok)}
+    lengths = [x["length"] for x in ok if "length" in x]
+    if lengths:
+        for key in ["words", "words_no_bracket", "minutes_all", "minutes_no_bracket"]:
+            summary[key] = round(sum(x[key] for x in lengths), 3)
+    if any("comments" in x for x in ok):
+        summary["comments"] = sum(len(x.get("comments", [])) for x in ok)
+    return summary
+
+
+def _run_batch(
+    paths: tuple[Path],
+    output_format: str,
+    workers: int,
+    comments: bool = False,
+    length: bool = False,
+    words_per_minute: int = 160,
+    delimiter: str = "#edit ",
+):
+    files = list(iter_files(paths, recursive=True, globs=("*.txt",)))
+    process = partial(
+        _process_script,
+        comments=comments,
+        length=length,
+        words_per_minute=words_per_minute,
+        delimiter=delimiter,
+    )
+    show_path = len(files) > 1
+
+    # Parsing is pure python, processes work on several scripts at once and
+    # every result is printed as soon as its script is done
+    if workers > 1 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as executor:
+            futures = [executor.submit(process, x) for x in files]
+            results = (x.result() for x in as_completed(futures))
+            results = list(_print_results(results, output_format, delimiter, show_path))
+    else:
+        results = map(process, files)
+        results = list(_print_results(results, output_format, delimiter, show_path))
+
+    # The json document lists the scripts in the order they were given
+    order = {str(x): i for i, x in enumerate(files)}
+    results.sort(key=lambda x: order[x["path"]])
+
+    summary = _summary(results)
+    if output_format == "json":
+        click.echo(json.dumps({"scripts": results, "summary": summary}, indent=2))
+    elif output_format == "ndjson":
+        click.echo(json.dumps({"summary": summary}))
+    elif len(results) > 1:
+        _print_summary_table(summary)
+
+    if summary["errors"]:
+        raise click.ClickException(f"{summary['errors']} scripts could not be read")
+
+
+def _print_results(results, output_format: str, delimiter: str, show_path: bool):
+    """Prints every result as it arrives (except for json) and passes it on."""
+    console = Console()
+    for result in results:
+        if output_format == "ndjson":
+            click.echo(json.dumps(result))
+        elif output_format == "table":
+            if "error" in result:
+                click.echo(f"{result['path']}: {result['error']}", err=True)
+            else:
+                if show_path:
+                    console.rule(result["path"])
+                _print_tables(console, result, delimiter)
+        yield result
+
+
+def _print_tables(console, result: dict, delimiter: str):
+    if "comments" in result:
+        console.print(google_docs.comments_table(result["comments"], delimiter))
+    if "length" in result:
+        length = result["length"]
+        console.print(
+            google_docs.ScriptLength(
+                length["words"], length["words_no_bracket"], length["words_per_minute"]
+            ).table()
+        )
+
+
+def _print_summary_table(summary: dict):
+    table = Table(title="Summary")
+    table.add_column("Description")
+    table.add_column("Value")
+    for key, value in summary.items():
+        value = f"{value:.1f}" if isinstance(value, float) else str(value)
+        table.add_row(key.replace("_", " ").capitalize(), value, style="bright_yellow")
+    Console().print(table)
@@ -0,0 +1,845 @@
+import os
+import re
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, nullcontext
+from itertools import takewhile
+from typing import Iterable, Iterator
+
+import click
+import yt_dlp
+
+from modules.adaptive import AdaptiveLimiter, retry
+from modules.archive import Archive, range_key
+from modules.budget import budget
+from modules.cache import MetadataCache
+from modules.dashboard import DONE, RETRYING, SKIPPED, Dashboard
+from modules.formats import editor_format_selector, format_stats
+from modules.media import (
+    _convert_audio_to_mp3,
+    _convert_vp9_to_mp4,
+    _needs_h264_conversion,
+    _stream_to_h264,
+)
+from modules.trace import tracer
+
+metadata_cache = MetadataCache()
+archive = Archive()
+
+RETRY_DELAY = 1.0
+
+
+def convert_range_to_tuple(range_str: str) -> tuple[float, float]:
+    if len(range_str) != 11:
+        raise ValueError("Range should be in format 00:00-00:00")
+
+    data = [int(y) for x in range_str.split("-") for y in x.split(":")]
+
+    st = timedelta(minutes=data[0], seconds=data[1]).total_seconds()
+    et = timedelta(minutes=data[2], seconds=data[3]).total_seconds()
+
+    return st, et
+
+
+def _playlist_filter_options(fn):
+    fn = click.option(
+        "--match",
+        type=str,
+        default=None,
+        help="Only videos with a title matching this regex (case insensitive).",
+    )(fn)
+    fn = click.option(
+        "--since",
+        type=click.DateTime(formats=["%Y-%m-%d", "%Y%m%d"]),
+        default=None,
+        help="Only videos uploaded on or after this date, when the playlist lists dates.",
+    )(fn)
+    fn = click.option(
+        "--limit",
+        type=int,
+        default=None,
+        help="Only the first N videos of playlists and channels.",
+    )(fn)
+    return fn
+
+
+def expand_urls(
+    urls: Iterable[str],
+    limit: int | None = None,
+    since: datetime | None = None,
+    match: str | None = None,
+    stop_at: str | None = None,
+    dlp: yt_dlp.YoutubeDL | None = None,
+) -> Iterator[str]:
+    """Yields a video url for every video in urls, expanding playlists lazily.
+
+    Playlists and channels are extracted flat, so their entries only carry
+    the id, title and (approximate) upload date listed on the playlist page.
+    Entries are yielded as the pages arrive and the filters are applied to
+    them, so no metadata is fetched for videos that are filtered out and no
+    further pages are fetched once the limit is reached.
+
+    With stop_at the expansion stops at the video with that id, for channels
+    listed newest first that is everything uploaded since that video.
+    """
+    if dlp is None:
+        dlp = yt_dlp.YoutubeDL(
+            {
+                "quiet": True,
+                "extract_flat": "in_playlist",
+                "lazy_playlist": True,
+                # Dates from "2 weeks ago" on channel pages, used by --since
+                "extractor_args": {"youtubetab": {"approximate_date": [""]}},
+            }
+        )
+
+    if limit is not None and limit <= 0:
+        return
+
+    count = 0
+    for url in urls:
+        entries = _flat_entries(dlp, url)
+        if stop_at is not None:
+            entries = takewhile(
+                lambda x: (x.get("id") or _youtube_video_id(x["url"])) != stop_at,
+                entries,
+            )
+        for entry in _filter_entries(entries, since, match):
+            yield entry["url"]
+            count += 1
+            if count == limit:
+                return
+
+
+def _flat_entries(dlp: yt_dlp.YoutubeDL, url: str) -> Iterator[dict]:
+    if _youtube_video_id(url) is not None:
+        # A single video, the metadata is fetched by the download itself
+        yield {"url": url}
+        return
+
+    info = dlp.extract_info(url, download=False, process=False)
+    yield from _walk_entries(dlp, info, url)
+
+
+def _walk_entries(dlp: yt_dlp.YoutubeDL, info: dict, url: str) -> Iterator[dict]:
+    result_type = info.get("_type", "video")
+    if result_type == "video":
+        yield {**info, "url": url}
+    elif result_type in ("url", "url_transparent") and info.get("ie_key") != "Youtube":
+        # Redirects and nested playlists like the tabs of a channel
+        yield from _flat_entries(dlp, info["url"])
+    elif result_type in ("url", "url_transparent"):
+        yield info
+    else:
+        # entries is a generator that fetches the next page when needed
+        for entry in info.get("entries") or []:
+            if entry:
+                yield from _walk_entries(dlp, entry, entry.get("url") or url)
+
+
+def _filter_entries(
+    entries: Iterable[dict], since: datetime | None, match: str | None
+) -> Iterator[dict]:
+    """Filters flat playlist entries, entries without a title or date are kept."""
+    pattern = re.compile(match, re.IGNORECASE) if match else None
+    since_date = since.strftime("%Y%m%d") if since else None
+
+    for entry in entries:
+        title = entry.get("title")
+        if pattern and title is not None and not pattern.search(title):
+            continue
+        if since_date:
+            date = _entry_upload_date(entry)
+            if date is not None and date < since_date:
+                continue
+        yield entry
+
+
+def _entry_upload_date(entry: dict) -> str | None:
+    if entry.get("upload_date"):
+        return entry["upload_date"]
+    timestamp = entry.get("timestamp") or entry.get("release_timestamp")
+    if timestamp:
+        return datetime.fromtimestamp(timestamp, timezone.utc).strftime("%Y%m%d")
+    return None
+
+
+@click.command()
+@click.argument("urls", type=str, nargs=-1, required=True)
+@click.option(
+    "--download-folder",
+    type=click.Path(
+        exists=True,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+    help="Folder to save the downloaded audio files.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=4,
+    help="Number of worker threads to use for downloading.",
+)
+@click.option(
+    "--adaptive",
+    is_flag=True,
+    default=False,
+    help="Start with one download and grow up to --workers while throughput rises, halve on throttling.",
+)
+@click.option(
+    "--retries",
+    type=int,
+    default=2,
+    show_default=True,
+    help="How many times to retry a failed download.",
+)
+@click.option(
+    "--codec",
+    type=click.Choice(["mp3", "native"]),
+    default="mp3",
+    show_default=True,
+    help="mp3 encodes to 320k, native keeps the original opus/m4a stream and only remuxes it.",
+)
+@click.option(
+    "--encode-workers",
+    type=int,
+    default=None,
+    help="Number of mp3 encodes to run at once. Defaults to the number of cores.",
+)
+@click.option(
+    "--stats-json",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Write the stats of every download and the totals as json.",
+)
+@_playlist_filter_options
+def audio(
+    urls: tuple,
+    download_folder: Path,
+    workers: int,
+    adaptive: bool,
+    retries: int,
+    codec: str,
+    encode_workers: int | None,
+    stats_json: Path | None,
+    limit: int | None,
+    since: datetime | None,
+    match: str | None,
+):
+    """
+    Downloads YouTube videos and converts them to MP3 audio files.
+
+    URLS: YouTube video, playlist or channel URLs (Multiple).
+    """
+    yt_opts = {
+        "format": "bestaudio/best",
+        # Copies the audio stream into its own container without re-encoding
+        "postprocessors": [{"key": "FFmpegExtractAudio", "preferredcodec": "best"}],
+        "outtmpl": str(download_folder / "%(title)s.%(ext)s"),
+        # Progress is shown by the dashboard
+        "quiet": True,
+        "noprogress": True,
+    }
+
+    if not download_folder.exists():
+        download_folder.mkdir(parents=True)
+
+    limiter = AdaptiveLimiter(workers, adaptive=adaptive)
+    if adaptive:
+        # Hard stalls fail and are retried instead of blocking a slot
+        yt_opts["socket_timeout"] = limiter.stall_seconds
+
+    # Encoding is cpu bound and runs in its own pool, so the download workers
+    # keep downloading while the finished files are encoded.
+    encode_workers = encode_workers or os.cpu_count() or 1
+    dashboard = Dashboard(f"Audio ({codec})")
+    failures = 0
+    try:
+        with dashboard.live(), ThreadPoolExecutor(
+            max_workers=encode_workers
+        ) as encoder:
+
+            def encode(url: str, video_id: str | None, file_path: Path) -> Path:
+                dashboard.stage(url, "encoding")
+                try:
+                    file_path = _convert_audio_to_mp3(file_path)
+                except Exception as e:
+                    dashboard.failed(url, e)
+                    raise
+                if video_id:
+                    archive.add(video_id, "", codec, file_path)
+                dashboard.stage(url, DONE)
+                return file_path
+
+            def download_audio(url):
+                video_id = _youtube_video_id(url)
+                done = video_id and archive.get(video_id, "", codec)
+                if done:
+                    dashboard.stage(url, SKIPPED)
+                    return None
+
+                hooks = dashboard.hooks(url)
+
+                def attempt() -> Path:
+                    with limiter.slot() as progress_hook:
+                        dashboard.stage(url, "downloading")
+                        dlp = yt_dlp.YoutubeDL(
+                            {
+                                **yt_opts,
+                                "progress_hooks": [
+                                    progress_hook,
+                                    *hooks["progress_hooks"],
+                                ],
+                                "postprocessor_hooks": [
+                                    tracer.postprocessor_hook,
+                                    *hooks["postprocessor_hooks"],
+                                ],
+                            }
+                        )
+                        with tracer.span("download_audio", "download", url=url):
+                            info_dict = _extract_info(dlp, url, download=True)
+                    file_path = _downloaded_file_path(dlp, info_dict)
+                    limiter.success(file_path.stat().st_size)
+                    return file_path
+
+                try:
+                    file_path = retry(
+                        attempt,
+                        retries,
+                        RETRY_DELAY,
+                        f"Download of {url}",
+                        on_retry=lambda _: dashboard.stage(url, RETRYING),
+                    )
+                except Exception as e:
+                    dashboard.failed(url, e)
+                    raise
+                if codec == "mp3":
+                    dashboard.stage(url, "downloaded")
+                    return encoder.submit(encode, url, video_id, file_path)
+                if video_id:
+                    archive.add(video_id, "", codec, file_path)
+                dashboard.stage(url, DONE)
+                return None
+
+            with budget.pool(workers) as executor:
+                # Downloads start while the playlist pages are still being fetched
+                futures = []
+                for url in expand_urls(urls, limit=limit, since=since, match=match):
+                    dashboard.queued(url)
+                    futures.append(executor.submit(download_audio, url))
+                encodes = []
+                for future in as_completed(futures):
+                    try:
+                        encodes.append(future.result())
+                    except Exception:
+                        # Already marked failed, the other downloads go on
+                        failures += 1
+
+            for future in as_completed([x for x in encodes if x is not None]):
+                try:
+                    future.result()
+                except Exception:
+                    failures += 1
+    finally:
+        if stats_json:
+            dashboard.write_json(stats_json)
+    click.echo(budget.summary())
+    if adaptive:
+        click.echo(limiter.summary())
+    if failures:
+        raise click.ClickException(f"{failures} downloads failed")
+    click.echo("All downloads are complete.")
+
+
+def _range_suffix(start_time: float, end_time: float) -> str:
+    start_str = f"[{int(start_time // 60):02d}-{int(start_time % 60):02d}]"
+    end_str = f"[{int(end_time // 60):02d}-{int(end_time % 60):02d}]"
+    return f"{start_str}-{end_str}"
+
+
+def _video_options(
+    range_str: str | None,
+    download_folder: Path | None,
+    max_height: int | None,
+    quiet: bool = False,
+) -> tuple[dict, tuple[float, float] | None]:
+    yt_opts = {
+        "verbose": False,
+        "format": editor_format_selector(max_height, quiet=quiet),
+        "postprocessor_hooks": [tracer.postprocessor_hook],
+        "merge_output_format": "mp4",
+    }
+    if quiet:
+        yt_opts.update(quiet=True, noprogress=True)
+
+    if range_str:
+        start_time, end_time = convert_range_to_tuple(range_str)
+        suffix = _range_suffix(start_time, end_time)
+        time_range = (start_time, end_time)
+    else:
+        suffix = ""
+        time_range = None
+
+    if download_folder:
+        yt_opts["outtmpl"] = f"{download_folder}/%(title)s_{suffix}.%(ext)s"
+    else:
+        yt_opts["outtmpl"] = f"%(title)s_{suffix}.%(ext)s"
+
+    return yt_opts, time_range
+
+
+@tracer.traced("download_video", "download")
+def download_video(
+    url: str,
+    range_str: str | None = None,
+    download_folder: Path | None = None,
+    max_height: int | None = None,
+    progress_hooks: list | None = None,
+    postprocessor_hooks: list | None = None,
+    quiet: bool = False,
+) -> Path:
+    """Downloads one video, or the range of it, to an mp4.
+
+    With quiet neither yt-dlp nor the format selection print anything, the
+    hooks report the progress instead.
+    """
+    yt_opts, time_range = _video_options(
+        range_str, download_folder, max_height, quiet=quiet
+    )
+    yt_opts["progress_hooks"] = progress_hooks or []
+    yt_opts["postprocessor_hooks"] += postprocessor_hooks or []
+
+    if time_range:
+        yt_opts["download_ranges"] = yt_dlp.utils.download_range_func(
+            None, [time_range]
+        )
+        yt_opts["force_keyframes_at_cuts"] = True
+
+    dlp = yt_dlp.YoutubeDL(yt_opts)
+    # Download and get the metadata in the same pass
+    info_dict = _extract_info(dlp, url, download=True)
+
+    file_path = _downloaded_file_path(dlp, info_dict)
+
+    if not file_path.exists() or not file_path.is_file():
+        click.echo("Can find downloaded file")
+        raise FileNotFoundError(file_path)
+
+    return file_path
+
+
+@tracer.traced("download_video_ranges", "download")
+def download_video_ranges(
+    url: str,
+    ranges: list[tuple[float, float]],
+    download_folder: Path | None = None,
+    max_height: int | None = None,
+    progress_hooks: list | None = None,
+    postprocessor_hooks: list | None = None,
+    quiet: bool = False,
+) -> tuple[list[Path], dict]:
+    """Downloads several time ranges of one video with one YoutubeDL.
+
+    The metadata is extracted once for all ranges and every range ends up in
+    its own file, named like download_video names a single range. With quiet
+    yt-dlp prints nothing, the hooks report the progress instead.
+
+    Returns the downloaded files and the info dict.
+    """
+    yt_opts, _ = _video_options(None, download_folder, max_height, quiet=quiet)
+    outtmpl = "%(title)s_%(section_title)s.%(ext)s"
+    yt_opts["outtmpl"] = f"{download_folder}/{outtmpl}" if download_folder else outtmpl
+    yt_opts["download_ranges"] = lambda info_dict, ydl: [
+        {"start_time": start, "end_time": end, "title": _range_suffix(start, end)}
+        for start, end in ranges
+    ]
+    yt_opts["force_keyframes_at_cuts"] = True
+    yt_opts["progress_hooks"] = progress_hooks or []
+    yt_opts["postprocessor_hooks"] += postprocessor_hooks or []
+
+    dlp = yt_dlp.YoutubeDL(yt_opts)
+    info_dict = _extract_info(dlp, url, download=True)
+
+    file_paths = [
+        Path(x["filepath"])
+        for x in info_dict.get("requested_downloads") or []
+        if x.get("filepath")
+    ]
+    return file_paths, info_dict
+
+
+@tracer.traced("stream_video", "download")
+def stream_video(
+    url: str,
+    range_str: str | None = None,
+    download_folder: Path | None = None,
+    max_height: int | None = None,
+    quiet: bool = False,
+) -> Path:
+    """Downloads the video straight into the h.264 encoder.
+
+    ffmpeg reads the selected formats over http and encodes while they
+    arrive, so there is no intermediate file and no separate conversion pass.
+    """
+    yt_opts, time_range = _video_options(
+        range_str, download_folder, max_height, quiet=quiet
+    )
+    dlp = yt_dlp.YoutubeDL(yt_opts)
+    info_dict = _extract_info(dlp, url, download=False)
+
+    formats = info_dict.get("requested_formats") or [info_dict]
+    output_file = Path(dlp.prepare_filename(info_dict)).with_suffix(".mp4")
+    with budget.lease(len(formats)):
+        _stream_to_h264(formats, output_file, time_range, quiet=quiet)
+    return output_file
+
+
+def _youtube_video_id(url: str) -> str | None:
+    return yt_dlp.extractor.get_info_extractor("Youtube").get_temp_id(url)
+
+
+def _extract_info(dlp: yt_dlp.YoutubeDL, url: str, download: bool) -> dict:
+    """Processes the url like dlp.extract_info and returns the info dict.
+
+    Metadata for single youtube videos comes from the metadata cache when
+    possible, so only the media itself is fetched. Downloads lease their
+    connections from the budget.
+    """
+    video_id = _youtube_video_id(url)
+    if video_id is None:
+        info_dict = dlp.extract_info(url, download=False, process=False)
+        return _process(dlp, info_dict, download)
+
+    extracted = False
+
+    def extract() -> dict:
+        nonlocal extracted
+        extracted = True
+        with tracer.span("metadata", "download", video_id=video_id):
+            info = dlp.extract_info(url, download=False, process=False)
+        return dlp.sanitize_info(info, remove_private_keys=True)
+
+    info_dict = metadata_cache.get_or_extract(video_id, extract)
+    try:
+        return _process(dlp, info_dict, download)
+    except yt_dlp.utils.DownloadError:
+        if extracted:
+            raise
+        # The stream urls in the cached metadata may have expired
+        click.echo(f"Cached metadata for {video_id} failed, extracting again")
+        metadata_cache.delete(video_id)
+        info_dict = dlp.extract_info(url, download=False, process=False)
+        return _process(dlp, info_dict, download)
+
+
+def _process(dlp: yt_dlp.YoutubeDL, info_dict: dict, download: bool) -> dict:
+    if not download:
+        return dlp.process_ie_result(info_dict, download=False)
+    with _LeasePP(dlp) as lease_pp:
+        dlp.add_post_processor(lease_pp, when="before_dl")
+        return dlp.process_ie_result(info_dict, download=True)
+
+
+class _LeasePP(yt_dlp.postprocessor.PostProcessor):
+    """Leases the connections of every download once its formats are selected.
+
+    It runs before each download, so the lease only counts what yt-dlp opens:
+    ffmpeg reads every format of a time range at once, fragmented formats get
+    their share of the budget as concurrent fragments and plain http formats
+    are downloaded one after the other over one connection. A lease is
+    released once its last file is in, before post processing.
+    """
+
+    def __init__(self, downloader: yt_dlp.YoutubeDL):
+        super().__init__(downloader)
+        self._leases = ExitStack()
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        # The dlp may be processed again, with a new _LeasePP
+        self._closed = True
+        self._leases.close()
+
+    def _hook_progress(self, status, info_dict):
+        # Leasing is no post processing, the hooks don't hear about it
+        pass
+
+    def run(self, info):
+        if self._closed:
+            return [], info
+        formats = info.get("requested_formats") or [info]
+        if info.get("section_start") is not None:
+            connections, downloads = len(formats), 1
+        elif any(_is_fragmented(x) for x in formats):
+            connections, downloads = None, len(formats)
+        else:
+            connections, downloads = 1, len(formats)
+        lease = self._leases.enter_context(budget.lease(connections, downloads))
+        self._downloader.params.update(lease.options)
+        self._downloader.add_progress_hook(lease.progress_hook)
+        return [], info
+
+
+def _is_fragmented(format: dict) -> bool:
+    protocol = format.get("protocol") or ""
+    return bool(format.get("fragments")) or protocol.startswith(
+        ("m3u8", "http_dash_segments", "ism", "f4m")
+    )
+
+
+def _downloaded_file_path(dlp: yt_dlp.YoutubeDL, info_dict: dict) -> Path:
+    """Returns the final path of a downloaded file from its info dict.
+
+    yt-dlp records the path after merging and post processing in
+    requested_downloads, the filename template is only used as a fallback.
+    """
+    for download in info_dict.get("requested_downloads") or []:
+        if download.get("filepath"):
+            return Path(download["filepath"])
+
+    if info_dict.get("filepath"):
+        return Path(info_dict["filepath"])
+
+    return Path(dlp.prepare_filename(info_dict))
+
+
+@click.command()
+@click.argument("urls", type=str, nargs=-1, required=True)
+@click.option(
+    "--workers",
+    type=int,
+    default=1,
+    help="Number of videos of a playlist or channel to download at once.",
+)
+@_playlist_filter_options
+@click.option(
+    "-r",
+    "--range",
+    "range_str",
+    type=str,
+    help="Download range in min:sec as on youtube. Example: 01:11-20:22.",
+)
+@click.option(
+    "--download-folder",
+    "-o",
+    type=click.Path(
+        exists=True,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+)
+@click.option(
+    "--auto-convert",
+    "auto_convert",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=True,
+    help="Automatically converts to h.264 from VP9. Always downloads best quality.",  # TODO add more output formats like dnxhd
+)
+@click.option(
+    "--segments",
+    type=int,
+    show_default=True,
+    default=1,
+    help="Split the conversion into this many segments encoded in parallel, e.g. the number of cores.",
+)
+@click.option(
+    "--max-height",
+    "max_height",
+    type=int,
+    default=None,
+    help="Highest resolution to download, e.g. 1080. Defaults to the best available.",
+)
+@click.option(
+    "--stream",
+    "stream",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Encode to h.264 while downloading instead of converting afterwards. Needs no extra disk space.",
+)
+def video(
+    urls: tuple,
+    workers: int,
+    limit: int | None,
+    since: datetime | None,
+    match: str | None,
+    range_str: str,
+    download_folder: Path,
+    auto_convert: bool,
+    segments: int,
+    max_height: int | None,
+    stream: bool,
+):
+    """
+    Downloads YouTube videos, or every video of playlists and channels.
+
+    URLS: YouTube video, playlist or channel URLs (Multiple).
+    """
+    click.echo("Setting options for yt-dlp")
+
+    time_range = convert_range_to_tuple(range_str) if range_str else None
+    format = f"mp4-{max_height}p" if max_height else "mp4"
+
+    # Concurrent downloads report to the dashboard instead of the console
+    live = workers > 1
+    dashboard = Dashboard("Video")
+    echo = (lambda message: None) if live else click.echo
+
+    def fetch(url: str) -> Path:
+        echo(f"Downloading {url}")
+        if stream:
+            dashboard.stage(url, "streaming")
+            file_path = stream_video(
+                url,
+                range_str,
+                download_folder=download_folder,
+                max_height=max_height,
+                quiet=live,
+            )
+            echo(f"Downloaded to {file_path}")
+            return file_path
+
+        file_path: Path = download_video(
+            url,
+            range_str,
+            download_folder=download_folder,
+            max_height=max_height,
+            quiet=live,
+            **dashboard.hooks(url),
+        )
+
+        echo(f"Downloaded to {file_path}")
+
+        if _needs_h264_conversion(file_path):
+            echo("Video is not h.264, need to convert to edit with premiere pro")
+            if auto_convert:
+                dashboard.stage(url, "converting")
+                output_file_path: Path = (
+                    file_path.parent / f"{file_path.stem}_converted.mp4"
+                )
+                _convert_vp9_to_mp4(
+                    file_path, output_file_path, segments=segments, quiet=live
+                )
+                # TODO remove original file
+
+        else:
+            echo("Video is h.264")
+        return file_path
+
+    def download_one(url: str):
+        video_id = _youtube_video_id(url)
+        done = video_id and archive.get(video_id, range_key(time_range), format)
+        if done:
+            echo(f"Skipping {url}, already downloaded to {done}")
+            dashboard.stage(url, SKIPPED)
+            return
+
+        try:
+            file_path = fetch(url)
+        except Exception as e:
+            dashboard.failed(url, e)
+            raise
+
+        if video_id:
+            archive.add(video_id, range_key(time_range), format, file_path)
+        dashboard.stage(url, DONE)
+
+    with dashboard.live() if live else nullcontext(), budget.pool(workers) as executor:
+        futures = []
+        for url in expand_urls(urls, limit=limit, since=since, match=match):
+            dashboard.queued(url)
+            futures.append(executor.submit(download_one, url))
+        for future in as_completed(futures):
+            future.result()
+
+    click.echo(format_stats.summary())
+    click.echo(budget.summary())
+    click.echo("Done")
+
+
+@click.command()
+@click.argument("channel", type=str, required=True)
+@click.option(
+    "--audio",
+    "codec",
+    type=click.Choice(["mp3", "native"]),
+    default=None,
+    help="Download the audio in this format instead of the videos.",
+)
+@click.option(
+    "--download-folder",
+    "-o",
+    type=click.Path(
+        exists=True,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=4,
+    help="Number of videos to download at once.",
+)
+@click.option(
+    "--limit",
+    type=int,
+    default=None,
+    help="Only the newest N videos, useful for the first sync of a big channel.",
+)
+@click.pass_context
+def sync(
+    ctx: click.Context,
+    channel: str,
+    codec: str | None,
+    download_folder: Path,
+    workers: int,
+    limit: int | None,
+):
+    """
+    Downloads the videos of a channel uploaded since the last sync.
+
+    CHANNEL: YouTube channel or playlist url, listed newest first.
+    """
+    watermark = archive.watermark(channel)
+    if watermark:
+        click.echo(f"Last sync stopped at {watermark}")
+
+    # Only the channel pages up to the watermark are fetched
+    urls = list(expand_urls([channel], limit=limit, stop_at=watermark))
+    if not urls:
+        click.echo("Already up to date")
+        return
+
+    click.echo(f"{len(urls)} new videos")
+    if codec:
+        ctx.invoke(
+            audio,
+            urls=tuple(urls),
+            download_folder=download_folder,
+            workers=workers,
+            codec=codec,
+        )
+    else:
+        ctx.invoke(
+            video, urls=tuple(urls), download_folder=download_folder, workers=workers
+        )
+
+    # Only moved after everything downloaded, a failed sync is retried in full
+    newest = _youtube_video_id(urls[0])
+    if newest:
+        archive.set_watermark(channel, newest)
@@ -0,0 +1,21 @@
+import os
+from fnmatch import fnmatch
+from pathlib import Path
+
+
+def iter_files(paths: tuple[Path], recursive: bool, globs: tuple[str]):
+    """Yields files from paths, expanding directories while walking them."""
+    for path in paths:
+        if path.is_file():
+            yield path
+            continue
+
+        directories = [path]
+        while directories:
+            with os.scandir(directories.pop()) as entries:
+                for entry in sorted(entries, key=lambda x: x.name):
+                    if entry.is_dir():
+                        if recursive:
+                            directories.append(Path(entry.path))
+                    elif not globs or any(fnmatch(entry.name, x) for x in globs):
+                        yield Path(entry.path)
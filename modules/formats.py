@@ -0,0 +1,158 @@
+"""
+Format selection for yt-dlp
+
+Picks formats that can be edited in Premiere Pro and other editors without
+transcoding (h.264 video and aac audio) whenever they exist at the requested
+quality, and only falls back to other codecs when they don't.
+"""
+
+from threading import Lock
+
+import click
+
+EDITOR_VIDEO_CODECS = ("avc1", "h264")
+EDITOR_AUDIO_CODECS = ("mp4a", "aac")
+VP9_CODECS = ("vp9", "vp09")
+
+
+def _is_editor_video(format: dict) -> bool:
+    return (format.get("vcodec") or "").startswith(EDITOR_VIDEO_CODECS)
+
+
+def _is_editor_audio(format: dict) -> bool:
+    return (format.get("acodec") or "").startswith(EDITOR_AUDIO_CODECS)
+
+
+def _has_video(format: dict) -> bool:
+    return format.get("vcodec") not in (None, "none")
+
+
+def _has_audio(format: dict) -> bool:
+    return format.get("acodec") not in (None, "none")
+
+
+def _bitrate(format: dict) -> tuple[float, float]:
+    return format.get("fps") or 0, format.get("tbr") or 0
+
+
+class FormatStats:
+    """Counts the formats picked in a batch, shared between threads."""
+
+    def __init__(self):
+        self.selected = 0
+        self.editor_compatible = 0
+        self.transcodes_avoided = 0
+        self._lock = Lock()
+
+    def add(self, editor_compatible: bool, transcode_avoided: bool):
+        with self._lock:
+            self.selected += 1
+            self.editor_compatible += editor_compatible
+            self.transcodes_avoided += transcode_avoided
+
+    def summary(self) -> str:
+        return (
+            f"Formats selected {self.selected}, editor compatible "
+            f"{self.editor_compatible}, transcodes avoided {self.transcodes_avoided}"
+        )
+
+
+format_stats = FormatStats()
+
+
+def select_editor_formats(
+    formats: list[dict], max_height: int | None = None
+) -> tuple[list[dict], str, bool]:
+    """Ranks formats by editor compatibility against resolution and bitrate.
+
+    formats are ordered worst to best, like yt-dlp sorts them. The highest
+    resolution available (up to max_height) is the requested quality, at that
+    resolution h.264 always wins, bitrate only decides between equal codecs.
+
+    Returns the formats to download (video and audio, or one combined), why
+    they were chosen and whether the video still needs to be transcoded.
+    """
+    formats = [x for x in formats if x.get("url") or x.get("fragments")]
+    if max_height:
+        formats = [x for x in formats if (x.get("height") or 0) <= max_height]
+
+    videos = [x for x in formats if _has_video(x) and not _has_audio(x)]
+    audios = [x for x in formats if _has_audio(x) and not _has_video(x)]
+    if not videos or not audios:
+        # No separate streams, pick from the formats with both
+        videos = [x for x in formats if _has_video(x) and _has_audio(x)]
+        audios = []
+    if not videos:
+        raise ValueError("No video formats to select from")
+
+    height = max(x.get("height") or 0 for x in videos)
+    at_height = [x for x in videos if (x.get("height") or 0) == height]
+    compatible = [x for x in at_height if _is_editor_video(x)]
+    if compatible:
+        video = max(compatible, key=_bitrate)
+        reason = f"h.264 available at {height}p, no transcode needed"
+    else:
+        # VP9 decodes fastest for the transcode, else yt-dlp's own preference
+        vp9 = [x for x in at_height if (x.get("vcodec") or "").startswith(VP9_CODECS)]
+        video = max(vp9, key=_bitrate) if vp9 else at_height[-1]
+        reason = f"no h.264 at {height}p, {video.get('vcodec')} needs transcode"
+
+    selected = [video]
+    if audios:
+        compatible_audio = [x for x in audios if _is_editor_audio(x)]
+        if compatible_audio:
+            audio = max(
+                compatible_audio, key=lambda x: x.get("abr") or x.get("tbr") or 0
+            )
+        else:
+            audio = audios[-1]
+        selected.append(audio)
+        reason += f", audio {audio.get('acodec')}"
+
+    return selected, reason, not _is_editor_video(video)
+
+
+def editor_format_selector(
+    max_height: int | None = None, stats: FormatStats = format_stats, quiet=False
+):
+    """Format selector for the yt-dlp "format" option using select_editor_formats.
+
+    With quiet the selected formats are only counted, not printed.
+    """
+
+    def selector(ctx):
+        formats = ctx.get("formats") or []
+        selected, reason, needs_transcode = select_editor_formats(formats, max_height)
+
+        # What yt-dlp would have picked on its own, best is last
+        videos = [
+            x
+            for x in formats
+            if _has_video(x)
+            and (not max_height or (x.get("height") or 0) <= max_height)
+        ]
+        default_compatible = not videos or _is_editor_video(videos[-1])
+        stats.add(not needs_transcode, not needs_transcode and not default_compatible)
+
+        format_ids = "+".join(x["format_id"] for x in selected)
+        if not quiet:
+            click.echo(f"Selected format {format_ids}: {reason}")
+
+        if len(selected) == 1:
+            yield selected[0]
+            return
+
+        video, audio = selected
+        yield {
+            "format_id": format_ids,
+            "ext": "mp4",
+            "requested_formats": selected,
+            "protocol": f"{video.get('protocol')}+{audio.get('protocol')}",
+            "vcodec": video.get("vcodec"),
+            "acodec": audio.get("acodec"),
+            "width": video.get("width"),
+            "height": video.get("height"),
+            "fps": video.get("fps"),
+        }
+
+    return selector
@@ -8,6 +8,7 @@ Will split and keep #edit ones
 """
 
 from pathlib import Path
+import re
 from rich.console import Console
 from rich.table import Table
 from typeguard import typechecked
@@ -44,90 +45,137 @@ def _load_doc(filepath: Path):
     return raw_data
 
 
+class ScriptLength:
+    """Word counts of a script and how long it takes to read"""
+
+    def __init__(self, words: int, words_no_bracket: int, words_per_minute: int):
+        self.words = words
+        self.words_no_bracket = words_no_bracket
+        self.words_per_minute = words_per_minute
+
+    @property
+    def minutes_all(self) -> float:
+        return self.words / self.words_per_minute
+
+    @property
+    def minutes_no_bracket(self) -> float:
+        return self.words_no_bracket / self.words_per_minute
+
+    def to_dict(self) -> dict:
+        return {
+            "words": self.words,
+            "words_no_bracket": self.words_no_bracket,
+            "words_per_minute": self.words_per_minute,
+            "minutes_all": self.minutes_all,
+            "minutes_no_bracket": self.minutes_no_bracket,
+        }
+
+    def table(self) -> Table:
+        table = Table(title="Script Length")
+        columns = ["Description", "Value"]
+        for column in columns:
+            table.add_column(column)
+        table.add_section()
+
+
+
+        table.add_row(
+            "Words [All]",
+            str(self.words),
+            style="bright_blue"
+        )
+        table.add_section()
+        table.add_row(
+            "Words [no brackets (comments)]",
+            str(self.words_no_bracket),
+            style="bright_blue"
+        )
+        table.add_section()
+        table.add_row(
+            "Words [All]",
+            f"{self.minutes_all:.1f}",
+            style="bright_blue"
+        )
+        table.add_section()
+        table.add_row(
+            "Words [no brackets (comments)]",
+            f"{self.minutes_no_bracket:.1f}",
+            style="bright_blue"
+        )
+        table.add_section()
+        return table
+
+
 @typechecked
-def length(filepath: Path, words_per_minute=160, delimiter="#edit "):
-    raw_data = _load_doc(filepath)
+def script_length(filepath: Path, words_per_minute=160, delimiter="#edit ") -> ScriptLength:
+    """Counts the words line by line, without loading the whole file"""
+    words = 0
+    words_no_bracket = 0
+    with open(filepath, "r", encoding="utf-8") as f:
+        for line in f:
+            tokens = line.split()
+            words += len(tokens)
+            words_no_bracket += sum(
+                1
+                for y in tokens
+                if "[" not in y and "]" not in y and delimiter not in y
+            )
 
-    words = len([y for x in raw_data for y in x.split()])
-    words_no_bracket = len(
-        [
-            y
-            for x in raw_data
-            for y in x.split()
-            if "[" not in y and "]" not in y and delimiter not in y
-        ]
-    )
-
-    time_length_all = words / words_per_minute
-    time_length_no_bracket = words_no_bracket / words_per_minute
-
-    table = Table(title="Script Length")
-    columns = ["Description", "Value"]
-    for column in columns:
-        table.add_column(column)
-    table.add_section()
+    return ScriptLength(words, words_no_bracket, words_per_minute)
 
 
+@typechecked
+def length(filepath: Path, words_per_minute=160, delimiter="#edit ") -> ScriptLength:
+    result = script_length(filepath, words_per_minute=words_per_minute, delimiter=delimiter)
 
-    table.add_row(
-        "Words [All]",
-        str(words),
-        style="bright_blue"
-    )
-    table.add_section()
-    table.add_row(
-        "Words [no brackets (comments)]",
-        str(words_no_bracket),
-        style="bright_blue"
-    )
-    table.add_section()
-    table.add_row(
-        "Words [All]",
-        f"{time_length_all:.1f}",
-        style="bright_blue"
-    )
-    table.add_section()
-    table.add_row(
-        "Words [no brackets (comments)]",
-        f"{time_length_no_bracket:.1f}",
-        style="bright_blue"
-    )
-    table.add_section()
     console = Console()
-    console.print(table)
+    console.print(result.table())
+    return result
+
+
+_COMMENT_ID = re.compile(r"\[([a-z]+)\]")
 
 
 @typechecked
-def parse_comments(filepath: Path, delimiter="#edit "):
-    len_delimiter = len(delimiter)
+def _index_comments(raw_data: list[str]) -> dict[str, list[str]]:
+    """Lines of every [id] marker in the document, in one pass"""
+    index = {}
+    for line in raw_data:
+        # a line with the same id twice is still one match
+        for id in dict.fromkeys(_COMMENT_ID.findall(line)):
+            index.setdefault(id, []).append(line.strip())
+    return index
 
-    raw_data = _load_doc(filepath)
 
-    excel_col_gen = ExcelColumnIterator()
+@typechecked
+def _find_comments(raw_data: list[str], delimiter="#edit "):
+    """(id, script reference, comment) for every comment with the delimiter
+
+    Ordered like google docs numbers them: a, b, ... z, aa, ab
+    """
+    index = _index_comments(raw_data)
+
     matches = []
-    for _ in range(10000):  # Generate 52 columns
-        # print(next(excel_col_gen))
-
-        id = next(excel_col_gen)
-        id = f"[{id}]"
-        match = [x.strip() for x in raw_data if id in x]
-        if not match:
-            break
-        # print(f"{i} -> {match}")
+    for id in sorted(index, key=lambda x: (len(x), x)):
+        match = index[id]
         if len(match) < 2:
             continue
         if delimiter not in match[1]:
             continue
-        matches.append((id, *match))
+        matches.append((f"[{id}]", match[0], match[1]))
+    return matches
 
-    table = Table(title="Edits")
-    columns = ["Id", "Script reference", "Edit notes"]
-    for column in columns:
-        table.add_column(column)
-    table.add_section()
 
-    every_other_tracker = False
+@typechecked
+def script_comments(filepath: Path, delimiter="#edit ") -> list[dict]:
+    """Comments with the delimiter as id, script reference and edit notes"""
+    len_delimiter = len(delimiter)
+
+    raw_data = _load_doc(filepath)
+
+    matches = _find_comments(raw_data, delimiter=delimiter)
 
+    comments = []
     for match in matches:
         # unpack
         id, reference, comment = match
@@ -140,11 +188,31 @@ def parse_comments(filepath: Path, delimiter="#edit "):
         index_to_start_from = comment.index(delimiter) + len_delimiter
         comment = comment[index_to_start_from:]
 
+        comments.append(
+            {
+                "id": id[1:-1],  # cannot be [ab] need to be ab to show up
+                "reference": reference,
+                "comment": comment,
+            }
+        )
+    return comments
+
+
+def comments_table(comments: list[dict], delimiter="#edit ") -> Table:
+    table = Table(title="Edits")
+    columns = ["Id", "Script reference", "Edit notes"]
+    for column in columns:
+        table.add_column(column)
+    table.add_section()
+
+    every_other_tracker = False
+
+    for comment in comments:
         table.add_row(
             *[
-                id[1:-1],  # cannot be [ab] need to be ab to show up
-                reference,
-                comment,
+                comment["id"],
+                comment["reference"],
+                comment["comment"],
             ],
             style="bright_blue" if every_other_tracker else "bright_green",
         )
@@ -160,9 +228,16 @@ def parse_comments(filepath: Path, delimiter="#edit "):
             style="bright_yellow",
         )
     table.add_section()
+    return table
+
+
+@typechecked
+def parse_comments(filepath: Path, delimiter="#edit ") -> list[dict]:
+    comments = script_comments(filepath, delimiter=delimiter)
 
     console = Console()
-    console.print(table)
+    console.print(comments_table(comments, delimiter=delimiter))
+    return comments
 
 
 if __name__ == "__main__":
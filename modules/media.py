@@ -0,0 +1,733 @@
+from pathlib import Path
+from time import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from threading import Lock, Semaphore
+import os
+import shlex
+import subprocess
+import tempfile
+import json
+
+import click
+
+from modules.cache import ProbeCache
+from modules.files import iter_files
+from modules.trace import tracer
+
+probe_cache = ProbeCache()
+
+
+def _check_ffmpeg_installed():
+    try:
+        subprocess.run(
+            ["ffmpeg", "-version"],
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        return True
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def _get_audio_track_count(file_path: str) -> int:
+    try:
+        data = _ffprobe(Path(file_path))
+    except (TypeError, ValueError) as e:
+        click.echo(f"Error getting audio track count: {e}")
+        return 0
+    return len([x for x in data.get("streams", []) if x.get("codec_type") == "audio"])
+
+
+def _remux_command(
+    file_path: Path, output_dir: Path, audio_track_count: int, overwrite: bool = False
+) -> list:
+    """Builds one ffmpeg command writing the mp4 and every wav track.
+
+    All outputs are mapped from the same input so the source is only read
+    and demuxed once, instead of once per output file. ffmpeg never reads
+    stdin, existing outputs are overwritten or fail the remux.
+    """
+    output_base = output_dir / f"{Path(file_path).stem}_remux"
+
+    cmd = ["ffmpeg", "-nostdin", "-y" if overwrite else "-n", "-i", file_path]
+    # Video with the first audio track, same streams ffmpeg picks by default.
+    # Optional maps, so audio only recordings still get their mp4
+    cmd += ["-map", "0:v:0?", "-map", "0:a:0?", "-c:v", "copy", "-c:a", "aac"]
+    cmd += [f"{output_base}.mp4"]
+    for audio_track in range(audio_track_count):
+        cmd += ["-map", f"0:a:{audio_track}", "-acodec", "pcm_s24le"]
+        cmd += [f"{output_base}_{audio_track + 1}.wav"]
+    return cmd
+
+
+@click.command()
+@click.argument(
+    "file_paths",
+    type=click.Path(
+        exists=True,
+        file_okay=True,
+        readable=True,
+        path_type=Path,
+    ),
+    required=True,
+    nargs=-1,
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    "output_dir",
+    type=click.Path(
+        exists=False,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+    help="Output dir, will be created if not exists.",
+)
+@click.option(
+    "--delete",
+    "-d",
+    "delete",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Delete original file after successful convertion.",
+)
+@click.option(
+    "--no-prompt",
+    "no_prompt",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Shows no prompt for example when deleting original file. with --delete flag.",
+)
+@click.option(
+    "--overwrite",
+    "overwrite",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Overwrite existing output files instead of failing.",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    "jobs",
+    type=int,
+    show_default=True,
+    default=1,
+    help="Number of files to remux at the same time.",
+)
+@click.option(
+    "--jobs-per-disk",
+    "jobs_per_disk",
+    type=int,
+    show_default=True,
+    default=2,
+    help="Max ffmpeg processes reading or writing the same disk at the same time.",
+)
+def remux(
+    file_paths: tuple[Path],
+    output_dir: Path,
+    delete: bool,
+    no_prompt: bool,
+    overwrite: bool,
+    jobs: int,
+    jobs_per_disk: int,
+):
+    """
+    Remuxes the given MKV to mp4 and multiple wav files.
+
+    From OBS video file splitting audio tracks to separate WAV files and converting the video to MP4.
+
+    FILE_PATH: Path to the video file to remux.
+    """
+    if not _check_ffmpeg_installed():
+        click.echo("FFmpeg is not installed.")
+        return
+
+    output_dir.mkdir(exist_ok=True)
+
+    disk_limiter = DiskLimiter(jobs_per_disk)
+    timings: dict[Path, float | None] = {}
+    failed: list[Path] = []
+
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        futures = {
+            executor.submit(
+                _remux_file,
+                file_path,
+                output_dir,
+                disk_limiter,
+                quiet=jobs > 1,
+                overwrite=overwrite,
+            ): file_path
+            for file_path in file_paths
+        }
+        for future in as_completed(futures):
+            file_path = futures[future]
+            try:
+                timings[file_path] = future.result()
+            except Exception as e:
+                click.echo(f"Failed to remux {file_path}: {e}")
+                failed.append(file_path)
+                continue
+
+            if timings[file_path] is None or not delete:
+                continue
+
+            click.echo(f"Delete? {file_path}")
+            if no_prompt:
+                file_path.unlink()
+            elif (
+                input("Do you want to delete the original file? y/n: ").strip().lower()
+                == "y"
+            ):
+                file_path.unlink()
+
+    click.echo("Remux summary")
+    for file_path in file_paths:
+        if file_path in failed:
+            status = "  failed"
+        elif timings[file_path] is None:
+            status = " skipped"
+        else:
+            status = f"{timings[file_path]:8.2f}s"
+        click.echo(f"{status}  {file_path}")
+
+    if failed:
+        raise click.ClickException(f"{len(failed)} of {len(file_paths)} files failed")
+
+
+def _remux_file(
+    file_path: Path,
+    output_dir: Path,
+    disk_limiter: "DiskLimiter",
+    quiet=False,
+    overwrite=False,
+) -> float | None:
+    """Remuxes one file, returns the time it took or None if it was skipped."""
+    audio_track_count = _get_audio_track_count(str(file_path))
+    if audio_track_count == 0:
+        click.echo(f"No audio tracks found in {file_path}, skipping.")
+        return None
+
+    cmd = _remux_command(file_path, output_dir, audio_track_count, overwrite)
+    if quiet:
+        cmd[1:1] = ["-hide_banner", "-loglevel", "error", "-nostats"]
+
+    with disk_limiter.acquire(file_path, output_dir):
+        st = time()
+        click.echo(f"Running command: {shlex.join(str(x) for x in cmd)}")
+        _run_ffmpeg(cmd, "remux")
+        click.echo(f"Done {file_path}")
+        return time() - st
+
+
+class DiskLimiter:
+    """Limits how many ffmpeg processes read or write the same disk at once."""
+
+    def __init__(self, per_disk: int):
+        self.per_disk = max(per_disk, 1)
+        self._semaphores: dict[int, Semaphore] = {}
+        self._lock = Lock()
+
+    def _semaphore(self, device: int) -> Semaphore:
+        with self._lock:
+            return self._semaphores.setdefault(device, Semaphore(self.per_disk))
+
+    @contextmanager
+    def acquire(self, *paths: Path):
+        # Always acquired in the same order so two jobs can't deadlock
+        devices = sorted({_device(path) for path in paths})
+        semaphores = [self._semaphore(device) for device in devices]
+        for semaphore in semaphores:
+            semaphore.acquire()
+        try:
+            yield
+        finally:
+            for semaphore in reversed(semaphores):
+                semaphore.release()
+
+
+def _device(path: Path) -> int:
+    while not path.exists():
+        path = path.parent
+    return os.stat(path).st_dev
+
+
+@click.command()
+@click.argument(
+    "file_paths",
+    type=click.Path(
+        exists=True,
+        file_okay=True,
+        readable=True,
+        path_type=Path,
+    ),
+    required=True,
+    nargs=-1,
+)
+@click.option(
+    "--output-dir",
+    "-o",
+    "output_dir",
+    type=click.Path(
+        exists=False,
+        file_okay=False,
+        readable=True,
+        path_type=Path,
+    ),
+    default=Path.cwd(),
+    help="Output dir, will be created if not exists.",
+)
+@click.option(
+    "--delete",
+    "-d",
+    "delete",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Delete original file after successful convertion.",
+)
+@click.option(
+    "--no-prompt",
+    "no_prompt",
+    type=bool,
+    is_flag=True,
+    show_default=True,
+    default=False,
+    help="Shows no prompt for example when deleting original file. with --delete flag.",
+)
+def auto(file_paths: tuple[Path], output_dir: Path, delete: bool, no_prompt: bool):
+    """Using the auto-editor to automatically remove silence from video clips, even with multiple audiotracks and export to premiere.
+    auto-editor.exe --keep-tracks-separate --edit "audio:threshold=10%%,stream=1" --margin 0.2sec --export premiere %1
+    """
+    raise NotImplementedError
+    cmd = ""
+    subprocess.run(cmd, shell=True, check=True)
+    pass
+
+
+@click.command()
+@click.argument(
+    "paths",
+    type=click.Path(
+        exists=True,
+        file_okay=True,
+        dir_okay=True,
+        readable=True,
+        path_type=Path,
+    ),
+    required=True,
+    nargs=-1,
+)
+@click.option(
+    "--recursive",
+    "-r",
+    "recursive",
+    type=bool,
+    is_flag=True,
+    default=False,
+    help="Probe files in sub directories of given directories as well.",
+)
+@click.option(
+    "--glob",
+    "-g",
+    "globs",
+    type=str,
+    multiple=True,
+    help="Only probe files in directories matching the pattern, e.g. '*.mp4'. Multiple allowed.",
+)
+@click.option(
+    "--fields",
+    "-f",
+    "fields",
+    type=str,
+    default=None,
+    help="Comma separated fields to output, e.g. 'format.duration,streams.codec_name'.",
+)
+@click.option(
+    "--workers",
+    type=int,
+    default=os.cpu_count() or 4,
+    help="Number of ffprobe processes to run at the same time.",
+)
+def probe(
+    paths: tuple[Path],
+    recursive: bool,
+    globs: tuple[str],
+    fields: str | None,
+    workers: int,
+):
+    """probe video files using ffprobe and output to json
+
+    Outputs one json line per file (NDJSON) as soon as it's probed, so it can
+    be piped to jq. Directories are expanded to the files inside them.
+    """
+    field_list = [x.strip() for x in fields.split(",")] if fields else None
+
+    def probe_file(file_path: Path) -> dict:
+        try:
+            data = _ffprobe(file_path)
+        except (TypeError, ValueError) as e:
+            return {"path": str(file_path), "error": str(e)}
+        if field_list:
+            data = _project(data, field_list)
+        return {"path": str(file_path), **data}
+
+    errors = 0
+    for line in _imap_unordered(
+        probe_file, iter_files(paths, recursive, globs), workers
+    ):
+        errors += "error" in line
+        click.echo(json.dumps(line))
+
+    if errors:
+        raise click.ClickException(f"{errors} files could not be probed")
+
+
+def _imap_unordered(fn, items, workers: int):
+    """Maps fn over items in a thread pool, yielding results as they finish.
+
+    Only a few items per worker are queued at a time so huge inputs are
+    consumed lazily.
+    """
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(fn, item))
+            if len(pending) >= workers * 4:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+def _project(data, fields: list[str]):
+    """Keeps only the dotted fields of data, lists are projected per item."""
+    if isinstance(data, list):
+        return [_project(x, fields) for x in data]
+
+    grouped: dict[str, list[str]] = {}
+    for field in fields:
+        key, _, rest = field.partition(".")
+        grouped.setdefault(key, []).append(rest)
+
+    projected = {}
+    for key, rest in grouped.items():
+        if key not in data:
+            continue
+        if "" in rest or not isinstance(data[key], (dict, list)):
+            projected[key] = data[key]
+        else:
+            projected[key] = _project(data[key], rest)
+    return projected
+
+
+@tracer.traced("ffprobe", "ffprobe")
+def _ffprobe(input_file: Path) -> dict:
+    """ffprobe format and streams of the file as a dict.
+
+    Results are cached per path, size and mtime so unchanged files are never
+    probed twice, also between runs.
+    """
+    if not input_file.exists() or not input_file.is_file():
+        raise TypeError("ffprobe Inputfile doesn't exist or is not file")
+
+    return probe_cache.get_or_probe(input_file, _run_ffprobe)
+
+
+def _run_ffprobe(input_file: Path) -> dict:
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_format",
+        "-show_streams",
+        "-print_format",
+        "json",
+        str(input_file),
+    ]
+    p = subprocess.run(cmd, capture_output=True)
+    if not p.returncode == 0:
+        print(p.stdout)
+        print(p.stderr)
+        raise ValueError(f"ffprobe Got other returncode: {p.returncode}")
+
+    data: dict = json.loads(p.stdout)
+
+    if not data:
+        raise ValueError(f"ffprobe Got no data: {p.returncode}")
+    return data
+
+
+def _is_video_vp9(input_file: Path) -> bool:
+    """
+    Checks if the input video file is encoded with the VP9 codec.
+
+    Args:
+        input_file (Path): Path to the input video file.
+
+    Returns:
+        bool: True if the video codec is VP9, False otherwise.
+    """
+    return _video_codec(input_file) == "vp9"
+
+
+def _video_codec(input_file: Path) -> str | None:
+    """Codec name of the first video stream, None if there is none."""
+    try:
+        data = _ffprobe(input_file)
+    except Exception as e:
+        print(f"Error getting the video codec: {e}")
+        return None
+    for stream in data.get("streams", []):
+        if stream.get("codec_type") == "video" and not (
+            stream.get("disposition") or {}
+        ).get("attached_pic"):
+            return stream.get("codec_name")
+    return None
+
+
+def _needs_h264_conversion(input_file: Path) -> bool:
+    """True if the video has to be converted to edit it, any codec but h.264."""
+    return _video_codec(input_file) not in (None, "h264")
+
+
+@tracer.traced("convert_vp9_to_mp4", "convert")
+def _convert_vp9_to_mp4(
+    input_file: Path,
+    output_file: Path,
+    auto_delete_input_file_after_success=True,
+    segments: int = 1,
+    quiet: bool = False,
+):
+    echo = (lambda message: None) if quiet else click.echo
+    echo("#" * 50)
+    echo("Converting from VP9 to h.264...")
+    echo(f"{input_file} -> {output_file}")
+    if segments > 1:
+        _convert_to_h264_segmented(input_file, output_file, segments)
+    else:
+        cmd = [
+            "ffmpeg",
+            "-i",
+            input_file,
+            "-c:v",
+            "libx264",
+            "-c:a",
+            "aac",
+            output_file,
+        ]
+        _run_ffmpeg(cmd, "convert_vp9_to_mp4")
+
+    if auto_delete_input_file_after_success:
+        echo(f"Cleanup {input_file}")
+        input_file.unlink()
+
+        final_path = input_file.parent / f"{input_file.stem}{output_file.suffix}"
+
+        echo(f"Moving converted file {output_file} -> {final_path}")
+        output_file.rename(final_path)
+
+
+def _convert_audio_to_mp3(input_file: Path, bitrate: str = "320k") -> Path:
+    """Encodes an audio file to mp3 next to it and removes the original.
+
+    mp3 sources are kept as they are. The encode goes to a temporary file
+    first, an existing mp3 of the same name gets a numbered name instead of
+    being overwritten.
+    """
+    # yt-dlp names the extracted audio after its codec
+    if input_file.suffix.lower() == ".mp3":
+        return input_file
+
+    tmp_file = input_file.with_name(f"{input_file.stem}.encoding.mp3")
+    cmd = ["ffmpeg", "-y", "-i", input_file, "-vn", "-c:a", "libmp3lame"]
+    cmd += ["-b:a", bitrate, tmp_file]
+    try:
+        _run_ffmpeg(cmd, "convert_audio_to_mp3")
+    except Exception:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+    output_file = input_file.with_suffix(".mp3")
+    number = 1
+    while output_file.exists():
+        output_file = input_file.with_name(f"{input_file.stem} ({number}).mp3")
+        number += 1
+    tmp_file.rename(output_file)
+    input_file.unlink()
+    return output_file
+
+
+def _run_ffmpeg(cmd: list, name: str):
+    """Runs ffmpeg without a shell, file names derived from titles stay data."""
+    with tracer.span(f"ffmpeg {name}", "ffmpeg"):
+        p = subprocess.run([str(x) for x in cmd], capture_output=True)
+    if not p.returncode == 0:
+        print(p.stdout)
+        print(p.stderr)
+        raise ValueError(f"{name} Got other returncode: {p.returncode}")
+
+
+def _convert_to_h264_segmented(input_file: Path, output_file: Path, segments: int):
+    """Encodes the video to h.264 in segments at the same time.
+
+    The video is split at keyframes without re-encoding, every segment is
+    encoded by its own ffmpeg process and the results are joined losslessly
+    with the concat demuxer. Audio is encoded once from the source while
+    joining, so there are no gaps at the segment borders.
+    """
+    duration = float(_ffprobe(input_file)["format"]["duration"])
+    split_times = _split_times(_keyframe_times(input_file), duration, segments)
+    if not split_times:
+        click.echo("No keyframes to split at, converting in one piece")
+        cmd = [
+            "ffmpeg",
+            "-i",
+            input_file,
+            "-c:v",
+            "libx264",
+            "-c:a",
+            "aac",
+            output_file,
+        ]
+        _run_ffmpeg(cmd, "convert_vp9_to_mp4")
+        return
+
+    with tempfile.TemporaryDirectory(dir=output_file.parent) as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+
+        # Slightly before the keyframe so float rounding can't skip it
+        segment_times = ",".join(f"{max(x - 0.001, 0):.3f}" for x in split_times)
+        cmd = ["ffmpeg", "-i", input_file, "-map", "0:v:0", "-c", "copy"]
+        cmd += ["-f", "segment", "-segment_times", segment_times]
+        cmd += ["-reset_timestamps", "1", tmp_dir / "source_%04d.mkv"]
+        _run_ffmpeg(cmd, "convert_vp9_to_mp4 split")
+        sources = sorted(tmp_dir.glob("source_*.mkv"))
+        click.echo(f"Encoding {len(sources)} segments in parallel")
+
+        # Share the cores between the encoders instead of each using all
+        threads = max((os.cpu_count() or 1) // len(sources), 1)
+
+        def encode(source: Path) -> Path:
+            encoded = source.with_name(source.name.replace("source", "encoded"))
+            encoded = encoded.with_suffix(".mp4")
+            cmd = ["ffmpeg", "-i", source, "-c:v", "libx264", "-threads", threads]
+            cmd += [encoded]
+            _run_ffmpeg(cmd, "convert_vp9_to_mp4 segment")
+            return encoded
+
+        with ThreadPoolExecutor(max_workers=len(sources)) as executor:
+            encoded = list(executor.map(encode, sources))
+
+        concat_list = tmp_dir / "concat.txt"
+        concat_list.write_text(
+            "".join(f"file '{_concat_quote(x.as_posix())}'\n" for x in encoded),
+            encoding="utf-8",
+        )
+        cmd = ["ffmpeg", "-f", "concat", "-safe", "0", "-i", concat_list]
+        cmd += ["-i", input_file, "-map", "0:v", "-map", "1:a?"]
+        cmd += ["-c:v", "copy", "-c:a", "aac", output_file]
+        _run_ffmpeg(cmd, "convert_vp9_to_mp4 concat")
+
+
+def _concat_quote(path: str) -> str:
+    """Escapes a path for a single quoted entry of an ffmpeg concat list."""
+    return path.replace("'", "'\\''")
+
+
+@tracer.traced("stream_to_h264", "ffmpeg")
+def _stream_to_h264(
+    formats: list[dict],
+    output_file: Path,
+    time_range: tuple[float, float] | None = None,
+    quiet: bool = False,
+):
+    """Encodes formats to a h.264 mp4 while ffmpeg downloads them over http.
+
+    formats are yt-dlp format dicts with url, http_headers, vcodec and acodec.
+    The first video and first audio stream found are used, video that already
+    is h.264 is copied instead of encoded.
+    """
+    cmd = ["ffmpeg", "-y"]
+    maps = []
+    video_codec = None
+    has_audio = False
+    for i, format in enumerate(formats):
+        headers = format.get("http_headers") or {}
+        if headers:
+            cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+        if time_range:
+            cmd += ["-ss", str(time_range[0]), "-to", str(time_range[1])]
+        cmd += ["-i", format["url"]]
+
+        if video_codec is None and format.get("vcodec") != "none":
+            video_codec = format.get("vcodec") or ""
+            maps += ["-map", f"{i}:v:0"]
+        if not has_audio and format.get("acodec") != "none":
+            has_audio = True
+            maps += ["-map", f"{i}:a:0?"]
+
+    is_h264 = (video_codec or "").startswith(("avc1", "h264"))
+    cmd += maps
+    cmd += ["-c:v", "copy" if is_h264 else "libx264", "-c:a", "aac", str(output_file)]
+
+    if not quiet:
+        click.echo(
+            f"Streaming {'without' if is_h264 else 'with'} encoding -> {output_file}"
+        )
+    p = subprocess.run(cmd, capture_output=True)
+    if not p.returncode == 0:
+        print(p.stderr)
+        raise ValueError(f"stream_to_h264 Got other returncode: {p.returncode}")
+
+
+def _keyframe_times(input_file: Path) -> list[float]:
+    """Timestamps of the keyframes in the first video stream, from packets."""
+    cmd = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-select_streams",
+        "v:0",
+        "-show_entries",
+        "packet=pts_time,flags",
+        "-of",
+        "csv=p=0",
+        str(input_file),
+    ]
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    if not p.returncode == 0:
+        print(p.stderr)
+        raise ValueError(f"ffprobe Got other returncode: {p.returncode}")
+
+    times = []
+    for line in p.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags and pts_time not in ("", "N/A"):
+            times.append(float(pts_time))
+    return sorted(times)
+
+
+def _split_times(keyframes: list[float], duration: float, segments: int) -> list[float]:
+    """Picks the keyframes closest to splitting duration into equal segments."""
+    candidates = [x for x in keyframes if 0 < x < duration]
+    if not candidates:
+        return []
+
+    split_times = set()
+    for i in range(1, segments):
+        target = duration * i / segments
+        split_times.add(min(candidates, key=lambda x: abs(x - target)))
+    return sorted(split_times)
@@ -0,0 +1,176 @@
+"""
+Staged asyncio pipelines
+
+Items flow through stages connected by bounded queues. Every stage has its
+own number of workers, so a slow stage applies backpressure to the stages
+before it instead of piling up work. A failing item is retried and then
+recorded as failed without stopping the other items.
+"""
+
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from time import time
+from typing import Any, Callable
+
+from modules.adaptive import retry_async
+from modules.trace import tracer
+
+
+class Stage:
+    """One step of a pipeline.
+
+    fn is called with every item and can be sync (runs in a thread) or async.
+    With fan_out the result is an iterable of items passed on one by one,
+    otherwise the result is passed on as one item. None is never passed on.
+    on_retry and on_failure are called with the item and the error before a
+    retry and once the item failed for good.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable[[Any], Any],
+        concurrency: int = 1,
+        queue_size: int | None = None,
+        retries: int = 0,
+        fan_out: bool = False,
+        on_retry: Callable[[Any, Exception], None] | None = None,
+        on_failure: Callable[[Any, Exception], None] | None = None,
+    ):
+        self.name = name
+        self.fn = fn
+        self.concurrency = max(concurrency, 1)
+        self.queue_size = queue_size or self.concurrency * 2
+        self.retries = retries
+        self.fan_out = fan_out
+        self.on_retry = on_retry
+        self.on_failure = on_failure
+        self.stats = StageStats(name)
+
+    async def call(self, item):
+        if inspect.iscoroutinefunction(self.fn):
+            return await self.fn(item)
+        return await asyncio.to_thread(self.fn, item)
+
+
+class StageStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.processed = 0
+        self.produced = 0
+        self.retried = 0
+        self.failed: list[tuple[Any, Exception]] = []
+        self.started: float | None = None
+        self.finished: float | None = None
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+    def summary(self) -> str:
+        rate = self.processed / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.name:<13} {self.processed:>5} done {len(self.failed):>3} failed "
+            f"{self.retried:>3} retried {self.elapsed:>8.2f}s {rate:>7.2f} items/s"
+        )
+
+
+_DONE = object()
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], retry_delay: float = 1.0):
+        self.stages = stages
+        self.retry_delay = retry_delay
+
+    async def run(self, items) -> list:
+        """Feeds items through all stages, returns the output of the last."""
+        # Enough threads for every sync worker of every stage at once
+        threads = sum(stage.concurrency for stage in self.stages)
+        asyncio.get_running_loop().set_default_executor(
+            ThreadPoolExecutor(max_workers=threads)
+        )
+
+        queues = [asyncio.Queue(stage.queue_size) for stage in self.stages]
+        results = []
+
+        async def feed():
+            for item in items:
+                await queues[0].put(item)
+            for _ in range(self.stages[0].concurrency):
+                await queues[0].put(_DONE)
+
+        async def run_stage(i: int, stage: Stage):
+            async def output(result):
+                if i + 1 < len(queues):
+                    await queues[i + 1].put(result)
+                else:
+                    results.append(result)
+
+            async def worker():
+                while True:
+                    item = await queues[i].get()
+                    if item is _DONE:
+                        return
+                    if stage.stats.started is None:
+                        stage.stats.started = time()
+                    result = await self._process(stage, item)
+                    if result is None:
+                        continue
+                    for x in result if stage.fan_out else [result]:
+                        if x is not None:
+                            stage.stats.produced += 1
+                            await output(x)
+
+            await asyncio.gather(*[worker() for _ in range(stage.concurrency)])
+            stage.stats.finished = time()
+            if i + 1 < len(queues):
+                for _ in range(self.stages[i + 1].concurrency):
+                    await queues[i + 1].put(_DONE)
+
+        await asyncio.gather(
+            feed(), *[run_stage(i, stage) for i, stage in enumerate(self.stages)]
+        )
+        return results
+
+    async def _process(self, stage: Stage, item):
+        async def attempt():
+            with tracer.span(f"stage {stage.name}", "pipeline"):
+                return await stage.call(item)
+
+        def on_retry(e: Exception):
+            stage.stats.retried += 1
+            if stage.on_retry:
+                stage.on_retry(item, e)
+
+        try:
+            result = await retry_async(
+                attempt,
+                stage.retries,
+                self.retry_delay,
+                f"{stage.name} for {item}",
+                on_retry,
+            )
+        except Exception as e:
+            print(f"{stage.name} failed for {item}: {e!r}")
+            stage.stats.failed.append((item, e))
+            if stage.on_failure:
+                stage.on_failure(item, e)
+            return None
+
+        stage.stats.processed += 1
+        return result
+
+    def summary(self) -> str:
+        return "\n".join(stage.stats.summary() for stage in self.stages)
+
+    @property
+    def failed(self) -> list[tuple[str, Any, Exception]]:
+        return [
+            (stage.name, item, e)
+            for stage in self.stages
+            for item, e in stage.stats.failed
+        ]
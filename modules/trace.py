@@ -0,0 +1,178 @@
+"""
+Span based timing instrumentation
+
+Functions and blocks are wrapped in spans by name. While tracing is enabled
+(yt --trace out.json or yt --profile) every span records its start and
+duration, otherwise a span costs one attribute check. Spans are written as
+Chrome trace-event json, open it in chrome://tracing or ui.perfetto.dev, or
+summed up per name as a profile.
+"""
+
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import weakref
+from contextlib import contextmanager
+from pathlib import Path
+from time import perf_counter
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.spans: list[dict] = []
+        self._start = perf_counter()
+        self._lock = threading.Lock()
+        self._thread_names: dict[int, str] = {}
+        # Tracks of asyncio tasks, dropped with the task so ids aren't reused
+        self._task_ids: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+        self._next_task_id = 0
+        self._open_postprocessors: dict[tuple, float] = {}
+
+    def enable(self):
+        self.enabled = True
+        self._start = perf_counter()
+
+    def _tid(self) -> int:
+        """Thread id, or a made up one per asyncio task so tasks don't overlap."""
+        tid = threading.get_ident()
+        name = threading.current_thread().name
+        # Only look for a task when asyncio is in use, importing it is slow
+        asyncio = sys.modules.get("asyncio")
+        if asyncio is not None:
+            try:
+                task = asyncio.current_task()
+            except RuntimeError:
+                task = None
+            if task is not None:
+                if task not in self._task_ids:
+                    self._next_task_id += 1
+                    self._task_ids[task] = self._next_task_id
+                tid = self._task_ids[task]
+                name = task.get_name()
+        self._thread_names.setdefault(tid, name)
+        return tid
+
+    @contextmanager
+    def span(self, name: str, category: str = "", **args):
+        """Records the time spent inside the block as a span."""
+        if not self.enabled:
+            yield
+            return
+
+        with self._lock:
+            tid = self._tid()
+        st = perf_counter()
+        try:
+            yield
+        finally:
+            end = perf_counter()
+            span = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (st - self._start) * 1e6,
+                "dur": (end - st) * 1e6,
+                "pid": os.getpid(),
+                "tid": tid,
+            }
+            if args:
+                span["args"] = {k: str(v) for k, v in args.items()}
+            with self._lock:
+                self.spans.append(span)
+
+    def traced(self, name: str, category: str = ""):
+        """Decorator that wraps every call of a sync or async function in a span."""
+
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+
+                @functools.wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(name, category):
+                        return await fn(*args, **kwargs)
+
+                return async_wrapper
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.span(name, category):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def postprocessor_hook(self, status: dict):
+        """yt-dlp postprocessor hook, records merging, extracting audio etc."""
+        if not self.enabled or status.get("status") not in ("started", "finished"):
+            return
+        with self._lock:
+            tid = self._tid()
+            key = (tid, status.get("postprocessor"))
+            if status["status"] == "started":
+                self._open_postprocessors[key] = perf_counter()
+                return
+            st = self._open_postprocessors.pop(key, None)
+        if st is None:
+            return
+        end = perf_counter()
+        with self._lock:
+            self.spans.append(
+                {
+                    "name": f"postprocess {status.get('postprocessor')}",
+                    "cat": "yt-dlp",
+                    "ph": "X",
+                    "ts": (st - self._start) * 1e6,
+                    "dur": (end - st) * 1e6,
+                    "pid": os.getpid(),
+                    "tid": tid,
+                }
+            )
+
+    def write_chrome_trace(self, path: Path):
+        with self._lock:
+            events = [
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": os.getpid(),
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._thread_names.items()
+            ]
+            events += sorted(self.spans, key=lambda x: x["ts"])
+        Path(path).write_text(
+            json.dumps({"traceEvents": events, "displayTimeUnit": "ms"})
+        )
+
+    def profile(self) -> list[dict]:
+        """Calls and time per span name, most total time first."""
+        stats: dict[str, dict] = {}
+        with self._lock:
+            for span in self.spans:
+                x = stats.setdefault(
+                    span["name"],
+                    {"name": span["name"], "calls": 0, "total": 0.0, "max": 0.0},
+                )
+                seconds = span["dur"] / 1e6
+                x["calls"] += 1
+                x["total"] += seconds
+                x["max"] = max(x["max"], seconds)
+        return sorted(stats.values(), key=lambda x: x["total"], reverse=True)
+
+    def profile_summary(self) -> str:
+        lines = [f"{'span':<28} {'calls':>6} {'total':>10} {'mean':>9} {'max':>9}"]
+        for x in self.profile():
+            lines.append(
+                f"{x['name'][:28]:<28} {x['calls']:>6} {x['total']:>9.3f}s "
+                f"{x['total'] / x['calls']:>8.3f}s {x['max']:>8.3f}s"
+            )
+        return "\n".join(lines)
+
+
+tracer = Tracer()
@@ -0,0 +1,83 @@
+import functools
+from contextlib import contextmanager
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from threading import Lock, Thread
+
+import pytest
+
+import modules.media
+from modules.cache import ProbeCache
+
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def probe_cache(tmp_path, monkeypatch):
+    """Probes of the test files go to a cache of their own, not the user's."""
+    cache = ProbeCache(tmp_path / "probe.sqlite3")
+    monkeypatch.setattr(modules.media, "probe_cache", cache)
+    return cache
+
+
+@contextmanager
+def _serve(www: Path, handler_class):
+    handler = functools.partial(handler_class, directory=str(www))
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def http_server(tmp_path):
+    """Serves the files in tmp_path/www over http, stand-in for youtube servers.
+
+    Yields the folder and the base url.
+    """
+    www = tmp_path / "www"
+    www.mkdir()
+    with _serve(www, QuietHandler) as base_url:
+        yield www, base_url
+
+
+class Throttle:
+    """How many of the next requests are answered with 429 Too Many Requests."""
+
+    def __init__(self):
+        self.remaining = 0
+        self.sent = 0
+        self._lock = Lock()
+
+    def take(self) -> bool:
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            self.sent += 1
+            return True
+
+
+@pytest.fixture
+def throttling_http_server(tmp_path):
+    """Like http_server, but injects 429s, yields the folder, base url and Throttle."""
+    www = tmp_path / "www"
+    www.mkdir()
+    throttle = Throttle()
+
+    class ThrottlingHandler(QuietHandler):
+        def send_head(self):
+            if throttle.take():
+                self.send_error(429, "Too Many Requests")
+                return None
+            return super().send_head()
+
+    with _serve(www, ThrottlingHandler) as base_url:
+        yield www, base_url, throttle
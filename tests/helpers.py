@@ -0,0 +1,90 @@
+"""Fakes and generated media shared by the tests."""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+requires_ffmpeg = pytest.mark.skipif(
+    shutil.which("ffmpeg") is None or shutil.which("ffprobe") is None,
+    reason="ffmpeg and ffprobe need to be installed",
+)
+
+
+def generate_clip(output_file: Path, duration: int = 2, video_codec="libvpx-vp9"):
+    """Small test clip generated with ffmpeg lavfi."""
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-v",
+            "error",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc2=size=320x240:rate=25:duration={duration}",
+            "-f",
+            "lavfi",
+            "-i",
+            f"sine=frequency=440:duration={duration}",
+            "-c:v",
+            video_codec,
+            "-c:a",
+            "libopus" if output_file.suffix == ".webm" else "aac",
+            str(output_file),
+        ],
+        check=True,
+    )
+    return output_file
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+PLAYLIST_URL = "https://www.youtube.com/@channel/videos"
+VIDEO_IDS = ["SodXi2t1mtE", "NtYHC1KNGoc", "dQw4w9WgXcQ", "jNQXAC9IVRw"]
+
+
+def _entry(video_id, title, upload_date=None):
+    return {
+        "_type": "url",
+        "ie_key": "Youtube",
+        "id": video_id,
+        "url": f"https://www.youtube.com/watch?v={video_id}",
+        "title": title,
+        "upload_date": upload_date,
+    }
+
+
+class FakePlaylistDlp:
+    """Returns a lazily paged playlist and records how far it was read."""
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.fetched = 0
+
+    def extract_info(self, url, download=False, process=True):
+        assert not process
+
+        def entries():
+            for entry in self.entries:
+                self.fetched += 1
+                yield entry
+
+        return {"_type": "playlist", "id": "channel", "entries": entries()}
+
+
+def fake_playlist_dlp():
+    return FakePlaylistDlp(
+        [
+            _entry(VIDEO_IDS[0], "Launcher talk", "20240301"),
+            _entry(VIDEO_IDS[1], "Level design", "20240201"),
+            _entry(VIDEO_IDS[2], "Another launcher"),
+            _entry(VIDEO_IDS[3], "Old launcher", "20230101"),
+        ]
+    )
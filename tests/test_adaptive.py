@@ -0,0 +1,107 @@
+import pytest
+from click.testing import CliRunner
+
+import modules.download
+from modules.adaptive import AdaptiveLimiter, is_throttled, retry
+from yt import cli
+
+from helpers import FakeClock, generate_clip, requires_ffmpeg
+
+
+def test_limit_grows_while_throughput_rises():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(4, clock=clock)
+    assert limiter.limit == 1
+
+    clock.now += 1
+    limiter.success(1000)
+    assert limiter.limit == 2
+
+    clock.now += 1
+    limiter.success(1000)
+    limiter.success(1000)
+    assert limiter.limit == 3
+
+    # Throughput dropped, the limit is kept
+    clock.now += 10
+    for _ in range(3):
+        limiter.success(1000)
+    assert limiter.limit == 3
+
+
+def test_throttling_halves_limit_once_per_round():
+    limiter = AdaptiveLimiter(8, clock=FakeClock())
+    limiter.limit = 8
+
+    def throttled():
+        with limiter.slot():
+            raise OSError("HTTP Error 429: Too Many Requests")
+
+    with limiter.slot():
+        # Both downloads started in the same round
+        with pytest.raises(OSError):
+            throttled()
+    assert limiter.limit == 4
+
+    with limiter.slot():
+        pass
+    limiter.decrease("throttled", started_round=0)
+    assert limiter.limit == 4
+
+
+def test_stall_halves_limit():
+    clock = FakeClock()
+    limiter = AdaptiveLimiter(8, stall_seconds=5, clock=clock)
+    limiter.limit = 8
+    with limiter.slot() as progress_hook:
+        progress_hook({"status": "downloading"})
+        clock.now += 6
+        progress_hook({"status": "downloading"})
+    assert limiter.limit == 4
+
+
+def test_fixed_limit_never_changes():
+    limiter = AdaptiveLimiter(4, adaptive=False)
+    limiter.decrease("throttled")
+    limiter.success(1000)
+    assert limiter.limit == 4
+
+
+def test_is_throttled():
+    assert is_throttled(ValueError("ERROR: HTTP Error 403: Forbidden"))
+    assert not is_throttled(ValueError("HTTP Error 404: Not Found"))
+
+
+def test_retry_gives_up():
+    calls = []
+
+    def fail():
+        calls.append(1)
+        raise ValueError("HTTP Error 429: Too Many Requests")
+
+    with pytest.raises(ValueError):
+        retry(fail, retries=2, delay=0)
+    assert len(calls) == 3
+
+
+@requires_ffmpeg
+def test_audio_recovers_from_429(throttling_http_server, tmp_path, monkeypatch):
+    www, base_url, throttle = throttling_http_server
+    urls = [f"{base_url}/clip{i}.webm" for i in range(3)]
+    for i in range(3):
+        generate_clip(www / f"clip{i}.webm", duration=1)
+    download_folder = tmp_path / "audio"
+    download_folder.mkdir()
+
+    monkeypatch.setattr(modules.download, "RETRY_DELAY", 0.01)
+    monkeypatch.setattr(modules.download, "expand_urls", lambda urls, **_: urls)
+    throttle.remaining = 2
+
+    args = ["audio", *urls, "--codec", "native", "--adaptive", "--workers", "4"]
+    args += ["--retries", "3", "--download-folder", str(download_folder)]
+    result = CliRunner().invoke(cli, args)
+
+    assert result.exit_code == 0, result.output
+    assert throttle.sent == 2
+    assert "throttled" in result.output
+    assert len(list(download_folder.glob("*.opus"))) == 3
@@ -0,0 +1,62 @@
+from click.testing import CliRunner
+
+import modules.download
+from modules.archive import Archive, range_key
+from modules.download import expand_urls
+from yt import cli
+
+from helpers import PLAYLIST_URL, VIDEO_IDS, fake_playlist_dlp
+
+VIDEO_URLS = [f"https://www.youtube.com/watch?v={x}" for x in VIDEO_IDS]
+
+
+def test_archive_needs_the_output_file(tmp_path):
+    archive = Archive(tmp_path / "archive.sqlite3")
+    file_path = tmp_path / "clip.mp4"
+    file_path.touch()
+
+    archive.add("abc", range_key((83, 93.5)), "mp4", file_path)
+    assert archive.get("abc", "83-93.5", "mp4") == file_path
+    assert archive.get("abc", "", "mp4") is None
+    assert archive.get("abc", "83-93.5", "mp3") is None
+
+    file_path.unlink()
+    assert archive.get("abc", "83-93.5", "mp4") is None
+
+
+def test_expand_stops_at_watermark():
+    dlp = fake_playlist_dlp()
+    urls = list(expand_urls([PLAYLIST_URL], stop_at=VIDEO_IDS[2], dlp=dlp))
+    assert urls == VIDEO_URLS[:2]
+    assert dlp.fetched == 3
+
+
+def test_sync_skips_archived_and_moves_watermark(tmp_path, monkeypatch):
+    archive = Archive(tmp_path / "archive.sqlite3")
+    monkeypatch.setattr(modules.download, "archive", archive)
+    stops = []
+
+    def fake_expand_urls(urls, limit=None, since=None, match=None, stop_at=None):
+        if list(urls) != [PLAYLIST_URL]:
+            return iter(urls)
+        stops.append(stop_at)
+        return iter(VIDEO_URLS[: VIDEO_IDS.index(stop_at)] if stop_at else VIDEO_URLS)
+
+    monkeypatch.setattr(modules.download, "expand_urls", fake_expand_urls)
+
+    # Everything is in the archive already, so nothing is fetched
+    for video_id in VIDEO_IDS:
+        file_path = tmp_path / f"{video_id}.opus"
+        file_path.touch()
+        archive.add(video_id, "", "native", file_path)
+
+    args = ["sync", PLAYLIST_URL, "--audio", "native", "-o", str(tmp_path)]
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    assert f"{len(VIDEO_IDS)} skipped" in result.output
+    assert archive.watermark(PLAYLIST_URL + "/") == VIDEO_IDS[0]
+
+    result = CliRunner().invoke(cli, args)
+    assert result.exit_code == 0, result.output
+    assert "Already up to date" in result.output
+    assert stops == [None, VIDEO_IDS[0]]
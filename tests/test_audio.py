@@ -0,0 +1,126 @@
+import json
+import subprocess
+
+from click.testing import CliRunner
+
+import modules.download
+
+from modules.media import _convert_audio_to_mp3, _run_ffprobe
+from yt import cli
+
+from helpers import generate_clip, requires_ffmpeg
+
+
+def _audio(base_url, download_folder, *args):
+    result = CliRunner().invoke(
+        cli,
+        ["audio", f"{base_url}/clip.webm", "--download-folder", str(download_folder)]
+        + list(args),
+    )
+    assert result.exit_code == 0, result.output
+    return sorted(download_folder.iterdir())
+
+
+@requires_ffmpeg
+def test_native_audio_is_not_reencoded(http_server, tmp_path):
+    www, base_url = http_server
+    generate_clip(www / "clip.webm")
+    download_folder = tmp_path / "audio"
+    download_folder.mkdir()
+
+    (file_path,) = _audio(base_url, download_folder, "--codec", "native")
+
+    assert file_path.suffix == ".opus"
+    streams = _run_ffprobe(file_path)["streams"]
+    assert [x["codec_name"] for x in streams] == ["opus"]
+
+
+@requires_ffmpeg
+def test_mp3_is_encoded_after_download(http_server, tmp_path):
+    www, base_url = http_server
+    generate_clip(www / "clip.webm")
+    download_folder = tmp_path / "audio"
+    download_folder.mkdir()
+
+    stats_json = tmp_path / "stats.json"
+    (file_path,) = _audio(
+        base_url,
+        download_folder,
+        "--encode-workers",
+        "1",
+        "--stats-json",
+        str(stats_json),
+    )
+
+    assert file_path.suffix == ".mp3"
+    (item,) = json.loads(stats_json.read_text())["items"]
+    assert item["stage"] == "done"
+    assert item["bytes"] > 0
+    assert "ExtractAudio" in item["postprocessors"]
+    streams = _run_ffprobe(file_path)["streams"]
+    assert [x["codec_name"] for x in streams] == ["mp3"]
+    assert streams[0]["bit_rate"] == "320000"
+
+
+def _sine(output_file):
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=duration=1"]
+        + [str(output_file)],
+        check=True,
+    )
+    return output_file
+
+
+@requires_ffmpeg
+def test_mp3_source_is_kept(tmp_path):
+    source = _sine(tmp_path / "talk.mp3")
+    data = source.read_bytes()
+
+    assert _convert_audio_to_mp3(source) == source
+    assert source.read_bytes() == data
+
+
+@requires_ffmpeg
+def test_existing_mp3_is_not_overwritten(tmp_path):
+    existing = tmp_path / "talk.mp3"
+    existing.write_bytes(b"another talk")
+    source = _sine(tmp_path / "talk.opus")
+
+    file_path = _convert_audio_to_mp3(source)
+
+    assert file_path == tmp_path / "talk (1).mp3"
+    assert existing.read_bytes() == b"another talk"
+    assert sorted(x.name for x in tmp_path.iterdir()) == ["talk (1).mp3", "talk.mp3"]
+
+
+@requires_ffmpeg
+def test_failed_download_is_in_stats(http_server, tmp_path, monkeypatch):
+    www, base_url = http_server
+    generate_clip(www / "clip.webm")
+    (www / "broken.webm").write_bytes((www / "clip.webm").read_bytes())
+    download_folder = tmp_path / "audio"
+    download_folder.mkdir()
+
+    extract_info = modules.download._extract_info
+
+    def fail_broken(dlp, url, **kwargs):
+        if "broken" in url:
+            raise ValueError("HTTP Error 404")
+        return extract_info(dlp, url, **kwargs)
+
+    monkeypatch.setattr(modules.download, "_extract_info", fail_broken)
+    monkeypatch.setattr(modules.download, "RETRY_DELAY", 0)
+    stats_json = tmp_path / "stats.json"
+    result = CliRunner().invoke(
+        cli,
+        ["audio", f"{base_url}/broken.webm", f"{base_url}/clip.webm"]
+        + ["--download-folder", str(download_folder), "--codec", "native"]
+        + ["--retries", "1", "--stats-json", str(stats_json)],
+    )
+
+    assert result.exit_code == 1
+    assert "1 downloads failed" in result.output
+    assert len(list(download_folder.iterdir())) == 1
+    items = json.loads(stats_json.read_text())["items"]
+    stages = {x["key"].rsplit("/", 1)[1]: x["stage"] for x in items}
+    assert stages == {"broken.webm": "failed", "clip.webm": "done"}
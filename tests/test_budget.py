@@ -0,0 +1,87 @@
+from threading import Barrier, Lock
+
+import pytest
+
+from modules.budget import ConnectionBudget, parse_bandwidth
+
+
+def test_parse_bandwidth():
+    assert parse_bandwidth("500K") == 500 * 1024
+    assert parse_bandwidth("8MB/s") == 8 * 1024**2
+    assert parse_bandwidth("1000") == 1000
+    with pytest.raises(ValueError):
+        parse_bandwidth("fast")
+
+
+def test_later_download_still_gets_a_share():
+    budget = ConnectionBudget(16, max_bandwidth=1600)
+    with budget.lease() as first:
+        assert first.options == {
+            "concurrent_fragment_downloads": 8,
+            "ratelimit": 800,
+        }
+        with budget.lease() as second:
+            assert second.connections == 4
+            assert second.bandwidth == 400
+    assert (budget.in_use, budget.bandwidth_in_use) == (0, 0)
+
+
+def test_only_worker_gets_all_connections():
+    budget = ConnectionBudget(16, max_bandwidth=1600)
+
+    def download():
+        with budget.lease() as lease:
+            return lease.options
+
+    with budget.pool(1) as executor:
+        options = executor.submit(download).result()
+    assert options == {"concurrent_fragment_downloads": 16, "ratelimit": 1600}
+
+
+def test_queued_downloads_share_connections():
+    budget = ConnectionBudget(16, max_bandwidth=1600)
+    barrier = Barrier(4)
+    granted = []
+    lock = Lock()
+
+    def download():
+        barrier.wait()
+        with budget.lease() as lease:
+            with lock:
+                granted.append(lease.options)
+            barrier.wait()
+
+    with budget.pool(4) as executor:
+        futures = [executor.submit(download) for _ in range(8)]
+    for future in futures:
+        future.result()
+
+    assert len(granted) == 8
+    assert sum(x["ratelimit"] for x in granted[:4]) <= 1600
+    assert {x["concurrent_fragment_downloads"] for x in granted[:4]} == {4}
+    assert budget.peak == 16
+    assert budget.in_use == 0
+
+
+def test_lease_is_released_when_downloads_finish():
+    budget = ConnectionBudget(4)
+    with budget.lease(1, downloads=2) as lease:
+        lease.progress_hook({"status": "downloading"})
+        lease.progress_hook({"status": "finished"})
+        assert budget.in_use == 1
+        lease.progress_hook({"status": "finished"})
+        assert budget.in_use == 0
+        # Post processing runs while another download has the connections
+        with budget.lease() as other:
+            assert other.connections == 2
+    assert budget.in_use == 0
+
+
+def test_fixed_leases_wait_for_free_connections():
+    budget = ConnectionBudget(3)
+    with budget.lease(2) as first:
+        with budget.lease(2) as second:
+            assert first.connections == 2
+            assert second.connections == 1
+            assert budget.in_use == 3
+    assert budget.in_use == 0
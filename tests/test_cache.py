@@ -0,0 +1,96 @@
+import os
+
+from click.testing import CliRunner
+
+from modules.cache import MetadataCache
+from yt import cli
+
+from helpers import FakeClock
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, video_id, **extra):
+        def extract():
+            self.calls += 1
+            return {"id": video_id, "title": f"Video {video_id}", **extra}
+
+        return extract
+
+
+def test_cache_hit_skips_extraction(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite3")
+    extractor = FakeExtractor()
+
+    first = cache.get_or_extract("abc", extractor("abc"))
+    second = cache.get_or_extract("abc", extractor("abc"))
+
+    assert extractor.calls == 1
+    assert first == second == {"id": "abc", "title": "Video abc"}
+
+
+def test_cache_entries_expire(tmp_path):
+    clock = FakeClock()
+    cache = MetadataCache(tmp_path / "metadata.sqlite3", ttl=60, clock=clock)
+    extractor = FakeExtractor()
+
+    cache.get_or_extract("abc", extractor("abc"))
+    clock.now += 61
+    cache.get_or_extract("abc", extractor("abc"))
+
+    assert extractor.calls == 2
+
+
+def test_cache_evicts_oldest_over_size(tmp_path):
+    clock = FakeClock()
+    cache = MetadataCache(tmp_path / "metadata.sqlite3", max_bytes=3000, clock=clock)
+    extractor = FakeExtractor()
+
+    for video_id in ["a", "b", "c"]:
+        clock.now += 1
+        # random data so it doesn't compress away
+        blob = os.urandom(1000).hex()
+        cache.get_or_extract(video_id, extractor(video_id, blob=blob))
+
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+    assert cache.stats()["bytes"] <= 3000
+
+
+def test_deleted_entries_free_their_size(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite3", max_bytes=5000)
+
+    for _ in range(4):
+        cache.put("expired", {"blob": os.urandom(1000).hex()})
+        cache.delete("expired")
+    cache.put("a", {"blob": os.urandom(1000).hex()})
+    cache.put("b", {"blob": os.urandom(1000).hex()})
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is not None
+    assert cache.stats()["entries"] == 2
+
+
+def test_cache_skips_playlists(tmp_path):
+    cache = MetadataCache(tmp_path / "metadata.sqlite3")
+    extractor = FakeExtractor()
+
+    cache.get_or_extract("abc", extractor("abc", _type="playlist"))
+
+    assert cache.stats()["entries"] == 0
+
+
+def test_cache_cli_stats_and_clear(tmp_path, monkeypatch):
+    monkeypatch.setenv("YT_CACHE_DIR", str(tmp_path))
+    MetadataCache().put("abc", {"id": "abc"})
+
+    runner = CliRunner()
+    result = runner.invoke(cli, ["cache", "stats"])
+    assert result.exit_code == 0
+    assert '"entries": 1' in result.output
+
+    result = runner.invoke(cli, ["cache", "clear"])
+    assert result.exit_code == 0
+    assert MetadataCache().stats()["entries"] == 0
@@ -0,0 +1,93 @@
+from pathlib import Path
+
+from modules.clips import (
+    ClipPlanner,
+    _job_key,
+    _parse_cards,
+    _plan_downloads,
+    _saved_seconds,
+)
+
+TESTDATA = Path(__file__).parent / "testdata"
+
+
+def test_parse_cards_from_saved_page():
+    html = (TESTDATA / "ytks_search.html").read_text(encoding="utf-8")
+
+    assert list(_parse_cards(html)) == [
+        {"youtube_id": "SodXi2t1mtE", "start_time": "01:23"},
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "12:05"},
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "12:11"},
+    ]
+
+
+def test_plan_downloads_groups_and_merges_ranges():
+    clips = [
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "12:11"},
+        {"youtube_id": "SodXi2t1mtE", "start_time": "01:23"},
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "12:05"},
+        # adjacent to the previous range
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "12:21"},
+        {"youtube_id": "NtYHC1KNGoc", "start_time": "1:00:00"},
+    ]
+
+    assert _plan_downloads(clips, 10) == {
+        "NtYHC1KNGoc": [(725, 751), (3600, 3610)],
+        "SodXi2t1mtE": [(83, 93)],
+    }
+
+
+def test_planner_skips_ranges_planned_from_earlier_pages():
+    planner = ClipPlanner(10)
+
+    first = planner.plan([{"youtube_id": "SodXi2t1mtE", "start_time": "01:00"}])
+    second = planner.plan(
+        [
+            {"youtube_id": "SodXi2t1mtE", "start_time": "01:05"},
+            {"youtube_id": "SodXi2t1mtE", "start_time": "01:00"},
+        ]
+    )
+
+    assert first == [("SodXi2t1mtE", [(60, 70)], [(60, 70)])]
+    # the overlapping clip extends the planned one instead of a 5s sliver
+    assert second == [("SodXi2t1mtE", [(60, 75)], [(60, 70), (65, 75)])]
+    assert planner.num_clips == 3
+    assert planner.num_ranges == 2
+    assert planner.plan([{"youtube_id": "SodXi2t1mtE", "start_time": "01:02"}]) == []
+
+
+def test_planner_jobs_only_carry_clips_inside_their_ranges():
+    planner = ClipPlanner(10)
+    planner.plan([{"youtube_id": "SodXi2t1mtE", "start_time": "01:00"}])
+
+    (job,) = planner.plan(
+        [
+            {"youtube_id": "SodXi2t1mtE", "start_time": "01:05"},
+            {"youtube_id": "SodXi2t1mtE", "start_time": "05:00"},
+        ]
+    )
+
+    # The planned 60-70 is downloaded again with the new clip
+    assert job == ("SodXi2t1mtE", [(60, 75), (300, 310)], [(65, 75), (300, 310)])
+    assert _saved_seconds(job[2], job[1]) == -5
+    # Two overlapping clips downloaded as one range save their overlap
+    assert _saved_seconds([(60, 70), (65, 75)], [(60, 75)]) == 5
+
+
+def test_planner_plans_failed_ranges_again():
+    planner = ClipPlanner(10)
+    clip = {"youtube_id": "SodXi2t1mtE", "start_time": "01:00"}
+
+    (job,) = planner.plan([clip])
+    planner.forget(job)
+
+    assert planner.plan([clip]) == [job]
+
+
+def test_jobs_of_one_video_get_their_own_row():
+    planner = ClipPlanner(10)
+    (first,) = planner.plan([{"youtube_id": "SodXi2t1mtE", "start_time": "01:00"}])
+    (second,) = planner.plan([{"youtube_id": "SodXi2t1mtE", "start_time": "05:00"}])
+
+    assert _job_key(first) != _job_key(second)
+    assert _job_key(first).startswith("SodXi2t1mtE ")
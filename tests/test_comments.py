@@ -1,8 +1,11 @@
 from pathlib import Path
 from click.testing import CliRunner
 
+from modules import google_docs
 from yt import cli
 
+TESTDATA = Path(__file__).parent / "testdata"
+
 
 def _read_file(filepath):
     with open(filepath, "r", encoding="utf-8") as f:
@@ -16,6 +19,12 @@ def _filepaths_textfiles():
     ]
 
 
+def _filepaths_textfiles_expected():
+    return [
+        TESTDATA / "Video - rust game launcher - comments.txt",
+    ]
+
+
 def _load_files():
     files = _filepaths_textfiles()
     file_data = [_read_file(x) for x in files]
@@ -28,8 +37,33 @@ def test_comments():
     files = _filepaths_textfiles()
     file = files[0]
     runner = CliRunner()
-    result = runner.invoke(cli, ["doc", "comments", str(file)])
+    # rich wraps the table to the terminal width
+    result = runner.invoke(cli, ["doc", "comments", str(file)], env={"COLUMNS": "100"})
     print(result.stdout)
 
     assert result.exit_code == 0
-    #assert result.output == expected_output
+    assert result.output == expected_output
+
+
+def test_comments_after_gap():
+    raw_data = [
+        "First line[a] of the script\n",
+        "Second line[c] with[c] a deleted comment before it\n",
+        "\n",
+        "[a]#edit first note\n",
+        "[c]#edit note after the gap\n",
+    ]
+
+    matches = google_docs._find_comments(raw_data)
+
+    assert [x[0] for x in matches] == ["[a]", "[c]"]
+    assert matches[1][2] == "[c]#edit note after the gap"
+
+
+def test_comment_ids_in_google_docs_order():
+    ids = [f"[{x}]" for x in ["b", "aa", "z", "a"]]
+    raw_data = [f"line {x}\n" for x in ids] + [f"{x}#edit note\n" for x in ids]
+
+    matches = google_docs._find_comments(raw_data)
+
+    assert [x[0] for x in matches] == ["[a]", "[b]", "[z]", "[aa]"]
@@ -0,0 +1,39 @@
+import subprocess
+
+from modules.media import _convert_vp9_to_mp4, _ffprobe, _split_times
+
+from helpers import requires_ffmpeg
+
+
+def test_split_times_picks_nearest_keyframes():
+    keyframes = [0.0, 2.0, 4.0, 6.0, 8.0, 10.0]
+
+    assert _split_times(keyframes, 12.0, 3) == [4.0, 8.0]
+    assert _split_times(keyframes, 12.0, 1) == []
+
+
+def test_split_times_without_keyframes_to_split_at():
+    assert _split_times([0.0], 12.0, 4) == []
+    # fewer keyframes than segments gives fewer, unique splits
+    assert _split_times([0.0, 6.0], 12.0, 4) == [6.0]
+
+
+@requires_ffmpeg
+def test_convert_titles_with_shell_characters(tmp_path):
+    # Youtube titles end up in the file names
+    folder = tmp_path / 'it\'s $(touch pwned) `touch pwned` "quoted"'
+    folder.mkdir()
+    clip = folder / "clip's.webm"
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "testsrc2=size=160x120:d=4"]
+        + ["-f", "lavfi", "-i", "sine=duration=4", "-c:v", "libvpx-vp9", "-g", "25"]
+        + ["-deadline", "realtime", str(clip)],
+        check=True,
+    )
+    output = folder / "clip's_converted.mp4"
+
+    _convert_vp9_to_mp4(clip, output, segments=2, quiet=True)
+
+    final = folder / "clip's.mp4"
+    assert [x["codec_name"] for x in _ffprobe(final)["streams"]] == ["h264", "aac"]
+    assert not list(tmp_path.rglob("pwned"))
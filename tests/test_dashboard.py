@@ -0,0 +1,92 @@
+import json
+
+from rich.console import Console
+
+from modules.dashboard import DONE, RETRYING, Dashboard
+
+from helpers import FakeClock
+
+
+def _progress(hooks, filename, downloaded, total, speed, status="downloading"):
+    for hook in hooks["progress_hooks"]:
+        hook(
+            {
+                "status": status,
+                "filename": filename,
+                "downloaded_bytes": downloaded,
+                "total_bytes": total,
+                "speed": speed,
+                "info_dict": {"title": "Launcher"},
+            }
+        )
+
+
+def test_progress_of_all_files_adds_up():
+    clock = FakeClock()
+    dashboard = Dashboard("Audio", clock=clock)
+    dashboard.queued("a")
+    dashboard.queued("b")
+    hooks = dashboard.hooks("a")
+
+    clock.now += 1
+    _progress(hooks, "video.mp4", 300, 1000, 100.0)
+    _progress(hooks, "audio.m4a", 100, 200, 50.0)
+
+    item = dashboard.items["a"]
+    assert item.title == "Launcher"
+    assert item.stage == "downloading"
+    assert (item.downloaded, item.total, item.speed) == (400, 1200, 150.0)
+    totals = dashboard.totals()
+    assert totals["queued"] == 1
+    assert totals["active"] == 1
+    assert totals["bytes_per_second"] == 150.0
+    assert totals["eta"] == round(800 / 150, 1)
+
+
+def test_stages_and_stats(tmp_path):
+    clock = FakeClock()
+    dashboard = Dashboard("Audio", clock=clock)
+    dashboard.queued("a")
+    hooks = dashboard.hooks("a")
+
+    clock.now += 2
+    _progress(hooks, "clip.webm", 1000, 1000, 0, status="finished")
+    hooks["postprocessor_hooks"][0](
+        {"status": "started", "postprocessor": "ExtractAudio"}
+    )
+    assert dashboard.items["a"].stage == "ExtractAudio"
+    clock.now += 1
+    hooks["postprocessor_hooks"][0](
+        {"status": "finished", "postprocessor": "ExtractAudio"}
+    )
+    dashboard.stage("a", DONE)
+    dashboard.failed("b", ValueError("HTTP Error 404"))
+
+    console = Console(width=100, record=True)
+    console.print(dashboard.render())
+    assert "1/2 done" in console.export_text()
+
+    dashboard.write_json(tmp_path / "stats.json")
+    stats = json.loads((tmp_path / "stats.json").read_text())
+    assert stats["totals"]["done"] == 1
+    assert stats["totals"]["failed"] == 1
+    a, b = stats["items"]
+    assert a["wait_seconds"] == 2.0
+    assert a["seconds"] == 1.0
+    assert a["postprocessors"] == {"ExtractAudio": 1.0}
+    assert b["error"] == "ValueError('HTTP Error 404')"
+
+
+def test_retrying_item_is_active():
+    dashboard = Dashboard("Clips", clock=FakeClock())
+    dashboard.queued("a")
+    dashboard.stage("a", "downloading")
+    dashboard.stage("a", RETRYING)
+
+    totals = dashboard.totals()
+    assert (totals["active"], totals["retrying"], totals["failed"]) == (1, 1, 0)
+    assert dashboard.items["a"].finished_at is None
+
+    dashboard.failed("a", ValueError("HTTP Error 404"))
+    totals = dashboard.totals()
+    assert (totals["active"], totals["retrying"], totals["failed"]) == (0, 0, 1)
@@ -0,0 +1,60 @@
+import json
+import shutil
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from yt import cli
+
+TESTDATA = Path(__file__).parent / "testdata"
+SCRIPT = TESTDATA / "Video - rust game launcher.txt"
+
+
+def _exports(tmp_path):
+    folder = tmp_path / "exports"
+    (folder / "older").mkdir(parents=True)
+    shutil.copy(SCRIPT, folder / "first.txt")
+    shutil.copy(SCRIPT, folder / "older" / "second.txt")
+    (folder / "notes.md").write_text("not a script [a]")
+    return folder
+
+
+def test_doc_batch_ndjson(tmp_path):
+    folder = _exports(tmp_path)
+    result = CliRunner().invoke(
+        cli, ["doc", "default", str(folder), "--format", "ndjson", "--workers", "2"]
+    )
+    assert result.exit_code == 0, result.output
+
+    # One line per script as soon as it's done, in any order
+    lines = [json.loads(x) for x in result.output.splitlines()]
+    assert sorted(x["path"] for x in lines[:-1]) == [
+        str(folder / "first.txt"),
+        str(folder / "older" / "second.txt"),
+    ]
+    assert len(lines[0]["comments"]) == 5
+    assert lines[-1]["summary"]["scripts"] == 2
+    assert lines[-1]["summary"]["comments"] == 10
+    assert lines[-1]["summary"]["words"] == 2 * lines[0]["length"]["words"]
+
+
+def test_doc_batch_json_reports_errors(tmp_path):
+    folder = _exports(tmp_path)
+    (folder / "broken.txt").write_bytes(b"\xff\xfe\xfa")
+    result = CliRunner().invoke(
+        cli, ["doc", "length", str(folder), "--format", "json", "--workers", "1"]
+    )
+    assert result.exit_code == 1
+
+    data = json.loads(result.output[: result.output.rindex("}") + 1])
+    assert data["summary"]["scripts"] == 2
+    assert data["summary"]["errors"] == 1
+    assert "comments" not in data["summary"]
+
+
+def test_doc_batch_table_summary(tmp_path):
+    folder = _exports(tmp_path)
+    result = CliRunner().invoke(cli, ["doc", "comments", str(folder)])
+    assert result.exit_code == 0
+    assert result.output.count("Edits") == 2
+    assert "Summary" in result.output
@@ -0,0 +1,79 @@
+from click.testing import CliRunner
+
+import modules.download
+from modules.archive import Archive
+from modules.budget import ConnectionBudget
+from modules.download import download_video
+from modules.formats import format_stats
+from yt import cli
+
+from helpers import VIDEO_IDS, generate_clip, requires_ffmpeg
+
+
+class CachedMetadata:
+    """Metadata of every video, with its one h.264 format served locally."""
+
+    def __init__(self, base_url):
+        self.base_url = base_url
+
+    def get_or_extract(self, video_id, extract):
+        return {
+            "id": video_id,
+            "title": f"Launcher {video_id}",
+            "extractor": "youtube",
+            "extractor_key": "Youtube",
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "formats": [
+                {
+                    "format_id": "18",
+                    "url": f"{self.base_url}/clip.mp4",
+                    "ext": "mp4",
+                    "protocol": "http",
+                    "vcodec": "avc1.42001E",
+                    "acodec": "mp4a.40.2",
+                    "height": 240,
+                }
+            ],
+        }
+
+
+@requires_ffmpeg
+def test_formats_are_selected_once_per_download(http_server, tmp_path, monkeypatch):
+    www, base_url = http_server
+    generate_clip(www / "clip.mp4", video_codec="libx264")
+    monkeypatch.setattr(modules.download, "metadata_cache", CachedMetadata(base_url))
+    budget = ConnectionBudget(16)
+    monkeypatch.setattr(modules.download, "budget", budget)
+    selected = format_stats.selected
+
+    file_path = download_video(
+        f"https://www.youtube.com/watch?v={VIDEO_IDS[0]}", download_folder=tmp_path
+    )
+
+    assert file_path.exists()
+    assert format_stats.selected == selected + 1
+    # One plain http connection, given back after the download
+    assert budget.peak == 1
+    assert budget.in_use == 0
+
+
+@requires_ffmpeg
+def test_concurrent_videos_report_to_the_dashboard(http_server, tmp_path, monkeypatch):
+    www, base_url = http_server
+    generate_clip(www / "clip.mp4", video_codec="libx264")
+    monkeypatch.setattr(modules.download, "metadata_cache", CachedMetadata(base_url))
+    monkeypatch.setattr(modules.download, "archive", Archive(tmp_path / "archive"))
+    download_folder = tmp_path / "videos"
+    download_folder.mkdir()
+
+    result = CliRunner().invoke(
+        cli,
+        ["video", *(f"https://www.youtube.com/watch?v={x}" for x in VIDEO_IDS[:2])]
+        + ["--download-folder", str(download_folder), "--workers", "2"],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert len(list(download_folder.iterdir())) == 2
+    for line in ("Selected format", "Downloading https", "[download]"):
+        assert line not in result.output
+    assert "2/2 done" in result.output
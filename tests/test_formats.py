@@ -0,0 +1,76 @@
+import yt_dlp
+
+from modules.formats import FormatStats, editor_format_selector, select_editor_formats
+
+
+def _format(format_id, vcodec="none", acodec="none", height=None, tbr=None, **extra):
+    return {
+        "format_id": format_id,
+        "url": f"http://127.0.0.1/{format_id}",
+        "ext": (
+            "mp4" if vcodec.startswith("avc1") or acodec.startswith("mp4a") else "webm"
+        ),
+        "protocol": "https",
+        "vcodec": vcodec,
+        "acodec": acodec,
+        "height": height,
+        "tbr": tbr,
+        **extra,
+    }
+
+
+FORMATS = [
+    _format("139", acodec="mp4a.40.5", abr=48),
+    _format("140", acodec="mp4a.40.2", abr=128),
+    _format("251", acodec="opus", abr=160),
+    _format("136", vcodec="avc1.4d401f", height=720, tbr=1500),
+    _format("247", vcodec="vp9", height=720, tbr=1200),
+    _format("137", vcodec="avc1.640028", height=1080, tbr=3000),
+    _format("248", vcodec="vp9", height=1080, tbr=2500),
+    _format("271", vcodec="vp9", height=1440, tbr=6000),
+]
+
+
+def test_h264_preferred_at_same_height():
+    selected, reason, needs_transcode = select_editor_formats(FORMATS, max_height=1080)
+
+    assert [x["format_id"] for x in selected] == ["137", "140"]
+    assert not needs_transcode
+    assert "1080p" in reason
+
+
+def test_falls_back_to_transcode_without_h264():
+    selected, reason, needs_transcode = select_editor_formats(FORMATS)
+
+    assert [x["format_id"] for x in selected] == ["271", "140"]
+    assert needs_transcode
+
+
+def test_selector_in_yt_dlp_counts_avoided_transcodes():
+    stats = FormatStats()
+    dlp = yt_dlp.YoutubeDL(
+        {"format": editor_format_selector(1080, stats), "quiet": True}
+    )
+    info = dlp.process_ie_result(
+        {"id": "abc", "title": "abc", "formats": FORMATS}, download=False
+    )
+
+    assert info["format_id"] == "137+140"
+    assert [x["format_id"] for x in info["requested_formats"]] == ["137", "140"]
+    assert stats.selected == 1
+    assert stats.transcodes_avoided == 1
+
+
+def test_fallback_prefers_vp9_over_av1():
+    formats = FORMATS + [_format("401", vcodec="av01.0.12M.08", height=1440)]
+    selected, reason, needs_transcode = select_editor_formats(formats)
+
+    assert [x["format_id"] for x in selected] == ["271", "140"]
+    assert needs_transcode
+
+    selected, reason, needs_transcode = select_editor_formats(
+        [x for x in formats if x["format_id"] != "271"]
+    )
+    assert [x["format_id"] for x in selected] == ["401", "140"]
+    assert "av01" in reason
+    assert needs_transcode
@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from modules import google_docs
+from yt import cli
+
+TESTDATA = Path(__file__).parent / "testdata"
+SCRIPT = TESTDATA / "Video - rust game launcher.txt"
+
+
+def test_script_length_counts():
+    result = google_docs.script_length(SCRIPT, words_per_minute=100)
+
+    # Same counts as splitting the whole file at once
+    words = SCRIPT.read_text(encoding="utf-8").split()
+    assert result.words == len(words)
+    assert result.words_no_bracket == len(
+        [x for x in words if "[" not in x and "]" not in x]
+    )
+    assert result.minutes_all == result.words / 100
+    assert result.to_dict()["words_no_bracket"] == result.words_no_bracket
+
+
+def test_length_command_prints_table():
+    result = CliRunner().invoke(cli, ["doc", "length", str(SCRIPT)])
+    assert result.exit_code == 0
+    assert "Script Length" in result.output
+    assert "143" in result.output
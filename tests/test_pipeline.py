@@ -0,0 +1,69 @@
+import asyncio
+
+from modules.pipeline import Pipeline, Stage
+
+
+def test_pipeline_fans_out_and_isolates_errors():
+    attempts = {}
+    retried = []
+    failed = []
+
+    def split(item):
+        return [item, item + 100]
+
+    async def flaky(item):
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == 2 or (item == 3 and attempts[item] == 1):
+            raise ValueError(item)
+        return item * 10
+
+    pipeline = Pipeline(
+        [
+            Stage("split", split, fan_out=True),
+            Stage(
+                "flaky",
+                flaky,
+                concurrency=3,
+                retries=1,
+                on_retry=lambda item, e: retried.append(item),
+                on_failure=lambda item, e: failed.append(item),
+            ),
+        ],
+        retry_delay=0,
+    )
+    results = asyncio.run(pipeline.run([1, 2, 3]))
+
+    assert sorted(results) == [10, 30, 1010, 1020, 1030]
+    assert attempts[2] == 2
+    flaky_stats = pipeline.stages[1].stats
+    assert flaky_stats.processed == 5
+    assert flaky_stats.retried == 2
+    assert [(name, item) for name, item, _ in pipeline.failed] == [("flaky", 2)]
+    assert sorted(retried) == [2, 3]
+    assert failed == [2]
+
+
+def test_pipeline_bounded_queues_apply_backpressure():
+    produced = []
+
+    def produce(item):
+        produced.append(item)
+        return item
+
+    async def slow(item):
+        await asyncio.sleep(0.01)
+        # the fast stage can't run far ahead of the slow one
+        assert len(produced) - item <= 4
+        return item
+
+    pipeline = Pipeline(
+        [Stage("fast", produce, queue_size=1), Stage("slow", slow, queue_size=1)]
+    )
+    assert asyncio.run(pipeline.run(range(20))) == list(range(20))
+    assert "slow" in pipeline.summary()
+
+
+def test_pipeline_without_items():
+    pipeline = Pipeline([Stage("a", lambda x: x), Stage("b", lambda x: x)])
+    assert asyncio.run(pipeline.run([])) == []
+    assert "0.00 items/s" in pipeline.summary()
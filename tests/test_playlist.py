@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from modules.download import expand_urls
+
+from helpers import PLAYLIST_URL, VIDEO_IDS, fake_playlist_dlp
+
+
+def test_expand_playlist():
+    urls = list(expand_urls([PLAYLIST_URL], dlp=fake_playlist_dlp()))
+    assert urls == [f"https://www.youtube.com/watch?v={x}" for x in VIDEO_IDS]
+
+
+def test_single_video_is_not_extracted():
+    dlp = fake_playlist_dlp()
+    url = f"https://www.youtube.com/watch?v={VIDEO_IDS[0]}"
+    assert list(expand_urls([url], match="nothing", dlp=dlp)) == [url]
+    assert dlp.fetched == 0
+
+
+def test_limit_stops_pagination():
+    dlp = fake_playlist_dlp()
+    urls = list(expand_urls([PLAYLIST_URL], limit=1, dlp=dlp))
+    assert urls == [f"https://www.youtube.com/watch?v={VIDEO_IDS[0]}"]
+    assert dlp.fetched == 1
+
+
+def test_match_and_since_keep_undated_entries():
+    urls = expand_urls(
+        [PLAYLIST_URL],
+        since=datetime(2024, 1, 1),
+        match="LAUNCHER",
+        dlp=fake_playlist_dlp(),
+    )
+    assert [x.rsplit("=", 1)[1] for x in urls] == [VIDEO_IDS[0], VIDEO_IDS[2]]
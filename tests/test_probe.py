@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+
+import modules.media
+from modules.cache import ProbeCache
+
+from helpers import FakeClock
+
+PROBE = {
+    "streams": [
+        {"codec_type": "video", "codec_name": "vp9"},
+        {"codec_type": "audio", "codec_name": "opus"},
+        {"codec_type": "audio", "codec_name": "opus"},
+    ],
+    "format": {"duration": "10.0"},
+}
+
+
+def _fake_ffprobe(monkeypatch, tmp_path):
+    calls = []
+
+    def run_ffprobe(input_file):
+        calls.append(input_file)
+        return PROBE
+
+    monkeypatch.setattr(modules.media, "_run_ffprobe", run_ffprobe)
+    monkeypatch.setattr(
+        modules.media, "probe_cache", ProbeCache(tmp_path / "probe.sqlite3")
+    )
+    return calls
+
+
+def test_probe_runs_once_per_file(tmp_path, monkeypatch):
+    calls = _fake_ffprobe(monkeypatch, tmp_path)
+    video = tmp_path / "video.webm"
+    video.write_bytes(b"video")
+
+    assert modules.media._is_video_vp9(video)
+    assert modules.media._get_audio_track_count(str(video)) == 2
+    assert modules.media._ffprobe(video) == PROBE
+    assert len(calls) == 1
+
+    # a new run with an empty memory cache reads it from disk
+    monkeypatch.setattr(
+        modules.media, "probe_cache", ProbeCache(tmp_path / "probe.sqlite3")
+    )
+    modules.media._ffprobe(video)
+    assert len(calls) == 1
+
+
+def test_probe_again_when_file_changes(tmp_path, monkeypatch):
+    calls = _fake_ffprobe(monkeypatch, tmp_path)
+    video = tmp_path / "video.webm"
+    video.write_bytes(b"video")
+
+    modules.media._ffprobe(video)
+    video.write_bytes(b"changed video")
+    os.utime(video, ns=(0, 0))
+    modules.media._ffprobe(video)
+
+    assert len(calls) == 2
+
+
+def test_probe_directories_streams_ndjson(tmp_path, monkeypatch):
+    import json
+    from click.testing import CliRunner
+    from yt import cli
+
+    calls = _fake_ffprobe(monkeypatch, tmp_path)
+    archive = tmp_path / "archive"
+    (archive / "2023").mkdir(parents=True)
+    (archive / "a.mp4").write_bytes(b"a")
+    (archive / "2023" / "b.mp4").write_bytes(b"b")
+    (archive / "2023" / "notes.txt").write_bytes(b"notes")
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["probe", "-r", "-g", "*.mp4", "-f", "streams.codec_type", str(archive)],
+    )
+
+    assert result.exit_code == 0
+    lines = [json.loads(x) for x in result.output.splitlines()]
+    assert sorted(Path(x["path"]).name for x in lines) == ["a.mp4", "b.mp4"]
+    assert lines[0]["streams"][0] == {"codec_type": "video"}
+    assert "format" not in lines[0]
+    assert len(calls) == 2
+
+
+def test_probe_cache_evicts_oldest_entries_in_batches(tmp_path):
+    clock = FakeClock()
+    cache = ProbeCache(
+        tmp_path / "probe.sqlite3", max_entries=10, clock=clock, memory_entries=2
+    )
+    keys = [(f"/videos/{i}.mkv", i, i) for i in range(11)]
+    for key in keys:
+        clock.now += 1
+        cache.put(key, PROBE)
+
+    # Down to 90% of the limit at once, not one entry per insert
+    assert cache.stats()["entries"] == 9
+    assert len(cache._memory) == 2
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[2]) == PROBE
+
+    # The running count survives replacing entries and a new instance
+    cache.put(keys[2], PROBE)
+    cache = ProbeCache(tmp_path / "probe.sqlite3", max_entries=10, clock=clock)
+    cache.put(("/videos/new.mkv", 1, 1), PROBE)
+    assert cache.stats()["entries"] == 10
+
+
+def test_every_codec_but_h264_needs_conversion(tmp_path, monkeypatch):
+    probes = {
+        "av1.mp4": [{"codec_type": "video", "codec_name": "av1"}],
+        "h264.mp4": [{"codec_type": "video", "codec_name": "h264"}],
+        "audio.m4a": [
+            {"codec_type": "audio", "codec_name": "aac"},
+            {
+                "codec_type": "video",
+                "codec_name": "mjpeg",
+                "disposition": {"attached_pic": 1},
+            },
+        ],
+    }
+    monkeypatch.setattr(
+        modules.media, "_run_ffprobe", lambda x: {"streams": probes[x.name]}
+    )
+    monkeypatch.setattr(
+        modules.media, "probe_cache", ProbeCache(tmp_path / "probe.sqlite3")
+    )
+    needs_conversion = {}
+    for name in probes:
+        (tmp_path / name).write_bytes(b"media")
+        needs_conversion[name] = modules.media._needs_h264_conversion(tmp_path / name)
+
+    assert needs_conversion == {"av1.mp4": True, "h264.mp4": False, "audio.m4a": False}
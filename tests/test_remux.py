@@ -0,0 +1,88 @@
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from modules.media import _remux_command
+
+from helpers import requires_ffmpeg
+
+
+def test_remux_reads_input_once():
+    cmd = " ".join(map(str, _remux_command(Path("rec/obs.mkv"), Path("out"), 4)))
+
+    assert cmd.count(" -i ") == 1
+    assert "-c:v copy -c:a aac out/obs_remux.mp4" in cmd
+    for track in range(4):
+        assert (
+            f"-map 0:a:{track} -acodec pcm_s24le out/obs_remux_{track + 1}.wav" in cmd
+        )
+
+
+def test_remux_never_reads_stdin_or_prompts():
+    name = Path('rec/"$(touch pwned)`id`.mkv')
+    cmd = _remux_command(name, Path("out"), 1)
+
+    assert cmd[:3] == ["ffmpeg", "-nostdin", "-n"]
+    assert cmd[cmd.index("-i") + 1] == name
+    assert _remux_command(name, Path("out"), 1, overwrite=True)[2] == "-y"
+
+
+def test_remux_batch_skips_files_without_audio(tmp_path, monkeypatch):
+    import modules.media
+    from click.testing import CliRunner
+    from yt import cli
+
+    silent = tmp_path / "silent.mkv"
+    recording = tmp_path / "recording.mkv"
+    silent.touch()
+    recording.touch()
+
+    commands = []
+    monkeypatch.setattr(modules.media, "_check_ffmpeg_installed", lambda: True)
+    monkeypatch.setattr(
+        modules.media,
+        "_get_audio_track_count",
+        lambda file_path: 0 if file_path == str(silent) else 2,
+    )
+
+    def run(cmd, **kwargs):
+        commands.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0)
+
+    monkeypatch.setattr(modules.media.subprocess, "run", run)
+
+    runner = CliRunner()
+    result = runner.invoke(
+        cli,
+        ["remux", str(silent), str(recording), "-o", str(tmp_path / "out"), "-j", "2"],
+    )
+
+    assert result.exit_code == 0
+    assert len(commands) == 1
+    assert str(tmp_path / "out" / "recording_remux_2.wav") in commands[0]
+    assert "No audio tracks found" in result.output
+    assert "skipped" in result.output
+
+
+@requires_ffmpeg
+def test_remux_audio_only_recording(tmp_path):
+    from modules.media import DiskLimiter, _remux_file
+
+    # Quotes and shell syntax in the name are plain data
+    recording = tmp_path / 'voice "$HOME" `id`.mka'
+    subprocess.run(
+        ["ffmpeg", "-v", "error", "-f", "lavfi", "-i", "sine=duration=1"]
+        + ["-c:a", "flac", str(recording)],
+        check=True,
+    )
+    out = tmp_path / "out"
+    out.mkdir()
+
+    assert _remux_file(recording, out, DiskLimiter(1), quiet=True) is not None
+    assert (out / 'voice "$HOME" `id`_remux.mp4').exists()
+    assert (out / 'voice "$HOME" `id`_remux_1.wav').exists()
+    # Existing outputs are not overwritten without asking
+    with pytest.raises(ValueError):
+        _remux_file(recording, out, DiskLimiter(1), quiet=True)
+    assert _remux_file(recording, out, DiskLimiter(1), overwrite=True) is not None
@@ -0,0 +1,70 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+HEAVY_MODULES = ["yt_dlp", "playwright", "rich", "typeguard"]
+
+# Cumulative import time budget in microseconds for loading the cli and
+# resolving a light command. Generous on purpose, the heavy imports alone
+# add several hundred milliseconds.
+IMPORT_TIME_BUDGET_US = 150_000
+
+
+def _importtime(code: str) -> dict[str, int]:
+    """Runs `python -X importtime` on code.
+
+    Returns the cumulative import time in microseconds per top level import.
+    Nested imports are included with a time of 0 so they can be checked for.
+    """
+    p = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    modules = {}
+    for line in p.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        nested = name.startswith("  ")
+        modules[name.strip()] = 0 if nested else int(cumulative)
+    return modules
+
+
+def _command_importtime(command: str) -> dict[str, int]:
+    # A real invocation, so the group callback and its imports are measured
+    # too. --profile imports the tracer, --help stops before the command runs.
+    return _importtime(
+        f"import yt; yt.cli(['--profile', {command!r}, '--help'], standalone_mode=False)"
+    )
+
+
+@pytest.mark.parametrize(
+    "command, heavy_modules",
+    [
+        ("probe", HEAVY_MODULES),
+        ("remux", HEAVY_MODULES),
+        ("cache", HEAVY_MODULES),
+        # doc prints rich tables and type checks, but needs neither downloads
+        # nor ffmpeg
+        ("doc", ["yt_dlp", "playwright", "modules.media", "sqlite3"]),
+    ],
+)
+def test_commands_skip_heavy_imports(command, heavy_modules):
+    modules = _command_importtime(command)
+    for heavy in heavy_modules:
+        assert heavy not in modules, f"`yt {command}` imports {heavy}"
+
+
+def test_startup_import_time_budget():
+    baseline = _importtime("pass")
+    modules = _command_importtime("probe")
+    total = sum(t for name, t in modules.items() if name not in baseline)
+    assert total < IMPORT_TIME_BUDGET_US, f"startup took {total}us"
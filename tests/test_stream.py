@@ -0,0 +1,32 @@
+from modules.media import _run_ffprobe, _stream_to_h264
+
+from helpers import generate_clip, requires_ffmpeg
+
+
+@requires_ffmpeg
+def test_stream_encodes_while_downloading(http_server, tmp_path):
+    www, base_url = http_server
+    generate_clip(www / "clip.webm")
+
+    output_file = tmp_path / "clip.mp4"
+    formats = [
+        {"url": f"{base_url}/clip.webm", "vcodec": "vp9", "acodec": "none"},
+        {"url": f"{base_url}/clip.webm", "vcodec": "none", "acodec": "opus"},
+    ]
+    _stream_to_h264(formats, output_file)
+
+    streams = _run_ffprobe(output_file)["streams"]
+    assert [x["codec_name"] for x in streams] == ["h264", "aac"]
+    assert not list(tmp_path.glob("*.webm"))
+
+
+@requires_ffmpeg
+def test_stream_copies_h264(http_server, tmp_path):
+    www, base_url = http_server
+    generate_clip(www / "clip.mkv", video_codec="libx264")
+
+    output_file = tmp_path / "clip.mp4"
+    _stream_to_h264([{"url": f"{base_url}/clip.mkv", "vcodec": "avc1"}], output_file)
+
+    streams = _run_ffprobe(output_file)["streams"]
+    assert [x["codec_name"] for x in streams] == ["h264", "aac"]
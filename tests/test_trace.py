@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+from click.testing import CliRunner
+
+import modules.media
+from modules.cache import ProbeCache
+from modules.trace import Tracer, tracer
+
+
+def test_spans_only_recorded_when_enabled():
+    t = Tracer()
+    with t.span("off"):
+        pass
+    assert t.spans == []
+
+    t.enable()
+    with t.span("ffprobe", "ffprobe", file="a.mkv"):
+        pass
+    with t.span("ffprobe", "ffprobe"):
+        pass
+    assert [x["name"] for x in t.spans] == ["ffprobe", "ffprobe"]
+    assert t.spans[0]["args"] == {"file": "a.mkv"}
+
+    (stats,) = t.profile()
+    assert stats["name"] == "ffprobe"
+    assert stats["calls"] == 2
+    assert "ffprobe" in t.profile_summary()
+
+
+def test_traced_async_tasks_get_their_own_track():
+    t = Tracer()
+    t.enable()
+
+    @t.traced("scrape", "clips")
+    async def scrape(i):
+        await asyncio.sleep(0.01)
+        return i
+
+    async def main():
+        return await asyncio.gather(*(scrape(i) for i in range(3)))
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    assert len({x["tid"] for x in t.spans}) == 3
+
+
+def test_postprocessor_hook_pairs_start_and_finish():
+    t = Tracer()
+    t.enable()
+    t.postprocessor_hook({"status": "started", "postprocessor": "Merger"})
+    t.postprocessor_hook({"status": "finished", "postprocessor": "Merger"})
+    assert [x["name"] for x in t.spans] == ["postprocess Merger"]
+
+
+def test_trace_and_profile_options(tmp_path, monkeypatch):
+    from yt import cli
+
+    monkeypatch.setattr(tracer, "enabled", False)
+    monkeypatch.setattr(tracer, "spans", [])
+    monkeypatch.setattr(modules.media, "_run_ffprobe", lambda _: {"streams": []})
+    monkeypatch.setattr(
+        modules.media, "probe_cache", ProbeCache(tmp_path / "probe.sqlite3")
+    )
+    video = tmp_path / "video.mkv"
+    video.write_bytes(b"video")
+    trace = tmp_path / "trace.json"
+
+    result = CliRunner().invoke(
+        cli, ["--trace", str(trace), "--profile", "probe", str(video)]
+    )
+    assert result.exit_code == 0, result.output
+
+    events = json.loads(trace.read_text())["traceEvents"]
+    spans = [x for x in events if x["ph"] == "X"]
+    assert [x["name"] for x in spans] == ["ffprobe"]
+    assert {"name", "ts", "dur", "pid", "tid"} <= spans[0].keys()
+    assert any(x["ph"] == "M" for x in events)
+    assert "calls" in result.output
+
+
+def test_finished_tasks_do_not_share_a_track():
+    t = Tracer()
+    t.enable()
+
+    async def step():
+        with t.span("step"):
+            pass
+
+    async def main():
+        # One after the other, so a task can be freed before the next starts
+        for _ in range(5):
+            await asyncio.create_task(step())
+
+    asyncio.run(main())
+    assert len({x["tid"] for x in t.spans}) == 5
+    assert len(t._task_ids) == 0